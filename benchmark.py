@@ -0,0 +1,324 @@
+"""
+    *
+    *   Benchmark of the machine players.
+    *
+    *   Each engine is asked for its optimal movement over several suites of 3 x 3 positions, the machine being
+    *   always the one to move:
+    *       --> all: every non ending position reachable from the empty board, whoever the first player is.
+    *       --> openings: the ones with at most 2 tokens placed.
+    *       --> midgames: the ones with 3 to 5 tokens placed.
+    *       --> near_terminal: the ones with 6 or more tokens placed.
+    *   For every engine and suite it reports the wall time, the moves per second, the nodes visited, the
+    *   cutoffs and the peak memory allocated by a single search. The timing run is not instrumented: the
+    *   nodes and the cutoffs are counted in a second run and the memory in a third one, under tracemalloc.
+    *   The transposition tables are cleared before each suite, thus every suite starts cold.
+    *
+    *   A node is every call to the max / min functions of the search, leaves included. A cutoff is every
+    *   node which is not a leaf whose value fails out of the window: at least beta for the maximizing player,
+    *   at most alpha for the minimizing one. The transposition table hits which fail out of it count too.
+    *
+    *   The parallel benchmark times a movement of the enhanced machine player from the empty board with each
+    *   number of workers, without transposition tables, and tells whether it's the movement of the first one.
+    *
+    *   Usage: python benchmark.py [--engines name ...] [--suites name ...] [--output results.json]
+    *          python benchmark.py --compare old.json new.json
+    *          python benchmark.py --parallel 1 2 4 8 [--board 5 5 4] [--depth 4]
+    *
+"""
+import argparse
+import hashlib
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+SUITES = ('all', 'openings', 'midgames', 'near_terminal')
+ENGINES = ('machine_player', 'enhanced_machine_player', 'enhanced_search')
+# the metrics --compare reports, and whether a greater value is better.
+METRICS = (('wall_time', False), ('moves_per_second', True), ('nodes', False), ('cutoffs', True),
+           ('peak_memory', False))
+
+
+def reachable_positions():
+    """
+    :return: the masks (machine, human) of every non ending position with the machine to move, reachable from
+        the empty board whoever the first player is. They are sorted so that every run uses the same order.
+    """
+    from win_detection import board_status
+    positions = set()
+    seen = set()
+    pending = [(0, 0, True), (0, 0, False)]
+    while pending:
+        position = pending.pop()
+        if position in seen:
+            continue
+        seen.add(position)
+        machine_mask, human_mask, machine_turn = position
+        if board_status((human_mask, machine_mask))[0]:
+            continue
+        if machine_turn:
+            positions.add((machine_mask, human_mask))
+        occupied = machine_mask | human_mask
+        for cell in range(0, 9):
+            bit = 1 << cell
+            if not occupied & bit:
+                if machine_turn:
+                    pending.append((machine_mask | bit, human_mask, False))
+                else:
+                    pending.append((machine_mask, human_mask | bit, True))
+    return sorted(positions)
+
+
+def suite_positions(name, positions):
+    tokens = {
+        'all': range(0, 9),
+        'openings': range(0, 3),
+        'midgames': range(3, 6),
+        'near_terminal': range(6, 9),
+    }[name]
+    return [(m, h) for m, h in positions if bin(m | h).count('1') in tokens]
+
+
+def to_board(machine_mask, human_mask, machine='o', human='x'):
+    from position_index import mask_to_board
+    return mask_to_board(machine_mask, human_mask, machine, human)
+
+
+def load_engine(name, use_table=True):
+    """
+    :return: the tuple (player factory, module, clear) of the engine, where clear empties its transposition
+        table. The engines are only imported when they are benchmarked.
+    """
+    if name == 'machine_player':
+        import machine_player as module
+    else:
+        import enhanced_machine_player as module
+    import transposition_table
+    table = transposition_table.default_table if use_table else None
+    if name == 'machine_player':
+        def factory(board):
+            return module.MachinePlayer(board, 'o', 'x', table=table)
+    elif name == 'enhanced_machine_player':
+        def factory(board):
+            return module.MachinePlayer(board, 'o', 'x', table=table)
+    elif name == 'enhanced_search':
+        # the enhanced engine without the tablebase, so the search is always carried out.
+        def factory(board):
+            return module.MachinePlayer(board, 'o', 'x', table=table, use_tablebase=False)
+    else:
+        raise ValueError(f'unknown engine {name}, expected one of {", ".join(ENGINES)}')
+
+    def clear():
+        if table is not None:
+            table.clear()
+    return factory, module, clear
+
+
+class NodeCounter:
+    """ It wraps the search functions of an engine while it's active, counting the nodes and the cutoffs. """
+
+    def __init__(self, module):
+        self.nodes = 0
+        self.cutoffs = 0
+        self.__patched = []
+        self.__targets = [(module, 'max_value_a_b', True, self.__wrap_state),
+                          (module, 'min_value_a_b', False, self.__wrap_state)]
+        if hasattr(module, 'SearchCore'):
+            self.__targets += [(module.SearchCore, 'max_value', True, self.__wrap_core),
+                               (module.SearchCore, 'min_value', False, self.__wrap_core)]
+
+    def __wrap_state(self, function, maximizing):
+        def counted(state, depth, alpha, beta, *args, **kwargs):
+            self.nodes += 1
+            value = function(state, depth, alpha, beta, *args, **kwargs)
+            if depth > 0 and not state.ending_state() and (value >= beta if maximizing else value <= alpha):
+                self.cutoffs += 1
+            return value
+        return counted
+
+    def __wrap_core(self, function, maximizing):
+        def counted(core, depth, alpha, beta, ply, cell):
+            self.nodes += 1
+            value = function(core, depth, alpha, beta, ply, cell)
+            if depth > 0 and not core._ending(core.machine_mask, core.human_mask) and \
+                    (value >= beta if maximizing else value <= alpha):
+                self.cutoffs += 1
+            return value
+        return counted
+
+    def __enter__(self):
+        for owner, name, maximizing, wrap in self.__targets:
+            function = getattr(owner, name)
+            self.__patched.append((owner, name, function))
+            setattr(owner, name, wrap(function, maximizing))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for owner, name, function in reversed(self.__patched):
+            setattr(owner, name, function)
+        self.__patched.clear()
+
+
+def run_suite(engine, positions, use_table=True):
+    """
+    :return: the metrics of the engine over the positions, as a dictionary.
+    """
+    factory, module, clear = load_engine(engine, use_table)
+    boards = [to_board(m, h) for m, h in positions]
+
+    # timing run, nothing is instrumented.
+    clear()
+    moves = []
+    start = time.perf_counter()
+    for board in boards:
+        moves.append(factory(board).get_optimal_move())
+    wall_time = time.perf_counter() - start
+
+    # counting run
+    clear()
+    with NodeCounter(module) as counter:
+        for board in boards:
+            factory(board).get_optimal_move()
+
+    # memory run, the peak of every single search.
+    clear()
+    peak_memory = 0
+    tracemalloc.start()
+    try:
+        for board in boards:
+            tracemalloc.reset_peak()
+            factory(board).get_optimal_move()
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'positions': len(boards),
+        'wall_time': wall_time,
+        'moves_per_second': len(boards) / wall_time if wall_time else None,
+        'nodes': counter.nodes,
+        'cutoffs': counter.cutoffs,
+        'peak_memory': peak_memory,
+        # the movements themselves, so a change of behaviour is spotted when comparing two runs.
+        'moves_digest': hashlib.sha1(repr(moves).encode()).hexdigest(),
+    }
+
+
+def run(engines=ENGINES, suites=SUITES, use_table=True):
+    positions = reachable_positions()
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'transposition_table': use_table,
+        'engines': {},
+    }
+    for engine in engines:
+        results['engines'][engine] = {suite: run_suite(engine, suite_positions(suite, positions), use_table)
+                                      for suite in suites}
+    return results
+
+
+def run_parallel(workers=(1, 2, 4, 8), rows=5, cols=5, win_length=4, depth=4, repeat=3):
+    """
+    :return: a list with a dict per number of workers: the best wall time of a movement out of repeat ones,
+        and whether the movement is the one of the first number of workers.
+    """
+    from enhanced_machine_player import MachinePlayer
+    results = []
+    for count in workers:
+        # without transposition tables, every movement is searched from scratch, in the processes too.
+        with MachinePlayer(None, 'o', 'x', table=None, rows=rows, cols=cols, win_length=win_length,
+                           max_depth=depth, move_ordering=False, workers=count) as player:
+            if count > 1:
+                # the first movement starts the processes of the pool, which are kept for the next ones.
+                player.get_optimal_move()
+            times = []
+            for _ in range(0, repeat):
+                start = time.perf_counter()
+                move = player.get_optimal_move()
+                times.append(time.perf_counter() - start)
+        if not results:
+            first_move = move
+        results.append({'workers': count, 'wall_time': min(times), 'same_move': move == first_move})
+    return results
+
+
+def format_results(results):
+    lines = [f'{"engine":<24} {"suite":<14} {"positions":>9} {"time (s)":>9} {"moves/s":>9} {"nodes":>10} '
+             f'{"cutoffs":>9} {"peak (KiB)":>10}']
+    for engine, suites in results['engines'].items():
+        for suite, metrics in suites.items():
+            lines.append(f'{engine:<24} {suite:<14} {metrics["positions"]:>9} {metrics["wall_time"]:>9.3f} '
+                         f'{metrics["moves_per_second"] or 0:>9.0f} {metrics["nodes"]:>10} '
+                         f'{metrics["cutoffs"]:>9} {metrics["peak_memory"] / 1024:>10.1f}')
+    return '\n'.join(lines)
+
+
+def compare(old, new):
+    """
+    :return: the lines of the report, one per engine, suite and metric found in both results. The change is
+        given as a percentage of the old value, flagged with + whenever it's an improvement.
+    """
+    lines = [f'{"engine":<24} {"suite":<14} {"metric":<17} {"old":>12} {"new":>12} {"change":>9}']
+    for engine, suites in new['engines'].items():
+        for suite, metrics in suites.items():
+            previous = old['engines'].get(engine, {}).get(suite)
+            if previous is None:
+                continue
+            for metric, greater_is_better in METRICS:
+                old_value = previous.get(metric)
+                new_value = metrics.get(metric)
+                if old_value is None or new_value is None:
+                    continue
+                if old_value:
+                    change = (new_value - old_value) / old_value * 100
+                    better = change > 0 if greater_is_better else change < 0
+                    text = f'{change:+8.1f}%{"+" if better and change else " "}'
+                else:
+                    text = f'{"n/a":>10}'
+                lines.append(f'{engine:<24} {suite:<14} {metric:<17} {old_value:>12.6g} {new_value:>12.6g} {text}')
+            if previous.get('moves_digest') != metrics.get('moves_digest'):
+                lines.append(f'{engine:<24} {suite:<14} the movements have changed')
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of the tic tac toe machine players.')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--suites', nargs='+', choices=SUITES, default=list(SUITES))
+    parser.add_argument('--no-table', action='store_true', help='disable the transposition tables')
+    parser.add_argument('--output', help='JSON file the results are written to')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='diff two JSON result files')
+    parser.add_argument('--parallel', nargs='+', type=int, metavar='WORKERS',
+                        help='it times a movement of the parallel search with each number of workers')
+    parser.add_argument('--board', nargs=3, type=int, default=(5, 5, 4), metavar=('ROWS', 'COLS', 'WIN_LENGTH'),
+                        help='board of the parallel benchmark')
+    parser.add_argument('--depth', type=int, default=4, help='depth of the parallel benchmark')
+    args = parser.parse_args(argv)
+
+    if args.parallel:
+        print(f'{"workers":>7} {"time (s)":>9} {"same move":>10}')
+        for row in run_parallel(args.parallel, *args.board, args.depth):
+            print(f'{row["workers"]:>7} {row["wall_time"]:>9.3f} {str(row["same_move"]):>10}')
+        return 0
+
+    if args.compare:
+        with open(args.compare[0]) as file:
+            old = json.load(file)
+        with open(args.compare[1]) as file:
+            new = json.load(file)
+        print('\n'.join(compare(old, new)))
+        return 0
+
+    results = run(args.engines, args.suites, not args.no_table)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
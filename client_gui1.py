@@ -1,11 +1,12 @@
 import wx
 import socket
 import threading
+from position_index import board_masks
+from protocol import MOVE, FrameReader, decode_move, encode_disconnect, encode_move
+from win_detection import board_status
 
 
-HEADERSIZE = 64
 PORT = 5050
-FORMAT = 'utf-8'
 DISCONNECTED = 'disconnected'
 # pass my ip in order to allow others to connect to it in my local network
 SERVER = "192.168.1.42"
@@ -40,27 +41,28 @@ def place_enemy_player_token():
 
 
 def receive_data():
+    global data_received
+    # the frames may arrive split or several at once.
+    reader = FrameReader()
     while True:
-        data = client.recv(2048).decode(FORMAT)
-        if data:
+        data = client.recv(2048)
+        if not data:
+            # the server has closed the connection.
+            return
+        for kind, payload in reader.feed(data):
+            if kind != MOVE:
+                continue
+            i, j, turn = decode_move(payload)
             print("[DATA has been successfully received]")
-            print(data)
-            global data_received
-            for elem in data_received:
-                data_received.remove(elem)
-            data_received = data.split(' ')
+            print(f'{i}-{j} {turn}')
+            data_received = [f'{i}-{j}', str(turn)]
             place_enemy_player_token()
 
 
-def send(msg):
+def send(frame):
 
     print("[STARTING SENDING DATA]")
-    message = msg.encode(FORMAT)
-    msg_length = len(message)
-    send_length = str(msg_length).encode(FORMAT)
-    send_length += b' ' * (HEADERSIZE - len(send_length))
-    client.send(send_length)
-    client.send(message)
+    client.sendall(frame)
 
 
 class Cell(wx.Button):
@@ -177,16 +179,14 @@ class Board(wx.Panel):
         # Set the sizer on the panel
         self.SetSizer(grid)
 
+    def masks(self):
+        # the names of the buttons tell which player has placed its token in each cell
+        names = [[cell.button.GetName() for cell in row] for row in self.board]
+        return board_masks(names, 'player1', 'player2')
+
     def is_board_full(self):
-        count = 0
-        for row in self.board:
-            for cell in row:
-                # print(cell.pos_x, cell.pos_y, cell.button.GetName())
-                if (cell.button.GetName() != '') is True:
-                    count += 1
-        if count == 9:
-            return True
-        return False
+        player1_mask, player2_mask = self.masks()
+        return player1_mask | player2_mask == (1 << 9) - 1
 
     def end_game(self):
         if self.is_board_full() is True:
@@ -218,7 +218,8 @@ class Board(wx.Panel):
 
                 # send the data
                 player_turn = "False"
-                thread = threading.Thread(target=send, args=(f'{cell_filled.pos_x}-{cell_filled.pos_y} {player_turn}',))
+                thread = threading.Thread(target=send, args=(encode_move(cell_filled.pos_x, cell_filled.pos_y,
+                                                                         player_turn == "True"),))
                 thread.daemon = True
                 thread.start()
 
@@ -240,23 +241,16 @@ class Board(wx.Panel):
             dialog.ShowModal()
 
     def is_a_win(self):
-        win_row_p1 = self.check_rows(self.board, 'player1', 0)
-        win_column_p1 = self.check_columns(self.board, 'player1', 0)
-        win_cross_left_p1 = self.check_crosses_left(self.board, 'player1')
-        win_cross_right_p1 = self.check_crosses_right(self.board, 'player1')
-
-        win_row_p2 = self.check_rows(self.board, 'player2', 0)
-        win_column_p2 = self.check_columns(self.board, 'player2', 0)
-        win_cross_left_p2 = self.check_crosses_left(self.board, 'player2')
-        win_cross_right_p2 = self.check_crosses_right(self.board, 'player2')
+        game_over, winner = board_status(self.masks())
+        winner = None if winner is None else ('player1', 'player2')[winner]
 
         # check which player has won
-        if win_row_p1 is True or win_column_p1 is True or win_cross_left_p1 is True or win_cross_right_p1 is True:
+        if winner == 'player1':
             # finish the game, player 1 has won
             dialog = wx.MessageDialog(None, message='Congratulations player1', style=wx.OK)
             dialog.ShowModal()
             # in order to disconnect the client
-            disconnect_thread = threading.Thread(target=send, args=("disconnectclient",))
+            disconnect_thread = threading.Thread(target=send, args=(encode_disconnect(),))
             disconnect_thread.daemon = True
             disconnect_thread.start()
             # shut down the panel and set up again the menu panel
@@ -264,12 +258,12 @@ class Board(wx.Panel):
             self.frame_instance.Layout()
             self.Destroy()
 
-        elif win_row_p2 is True or win_column_p2 is True or win_cross_left_p2 is True or win_cross_right_p2 is True:
+        elif winner == 'player2':
             # finish the game, player 2 has  won
             dialog = wx.MessageDialog(None, message='Congratulations player2', style=wx.OK)
             dialog.ShowModal()
             # in order to disconnect the client
-            disconnect_thread = threading.Thread(target=send, args=("disconnectclient",))
+            disconnect_thread = threading.Thread(target=send, args=(encode_disconnect(),))
             disconnect_thread.daemon = True
             disconnect_thread.start()
             # shut down the panel and set up again the menu panel
@@ -278,63 +272,6 @@ class Board(wx.Panel):
             self.Destroy()
 
 
-    @staticmethod
-    def check_rows(board, value, index_count):
-        win = False
-        while index_count < 3:
-            win_counter = 0
-            for row in board:
-                for cell in row:
-                    if cell.pos_x == index_count:
-                        if cell.button.GetName() == value:
-                            win_counter += 1
-            if win_counter == 3:
-                win = True
-                index_count = 9
-            index_count += 1
-        return win
-
-    @staticmethod
-    def check_columns(board, value, index_count):
-        win = False
-        while index_count < 8:
-            win_counter = 0
-            for row in board:
-                for cell in row:
-                    if cell.pos_y == index_count:
-                        if (cell.button.GetName() == value) is True:
-                            win_counter += 1
-            if win_counter == 3:
-                win = True
-                index_count = 9
-            index_count += 1
-        return win
-
-    @staticmethod
-    def check_crosses_left(board, value):
-        win_counter = 0
-        for row in board:
-            for cell in row:
-                if cell.pos_x + cell.pos_y == 2:
-                    if (cell.button.GetName() == value) is True:
-                        win_counter += 1
-        if win_counter == 3:
-            return True
-        return False
-
-    @staticmethod
-    def check_crosses_right(board, value):
-        win_counter = 0
-        for row in board:
-            for cell in row:
-                if cell.pos_x - cell.pos_y == 0:
-                    if (cell.button.GetName() == value) is True:
-                        win_counter += 1
-        if win_counter == 3:
-            return True
-        return False
-
-
 class MainApp(wx.App):
     def OnInit(self):
         """Initialise the main GUI Application"""
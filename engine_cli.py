@@ -0,0 +1,157 @@
+"""
+    *
+    *   Command line front end of the machine players.
+    *
+    *   It reads one board per line from the standard input and prints the optimal movement of the machine for
+    *   each one, in the same order, as "i j" or "-" if the game is already over. A board is written row by
+    *   row, the rows being separated by '/', where '_' is an empty cell:
+    *       o_x/xoo/_x_
+    *   The 3 x 3 boards may be written without the separators too: o_xxoo_x_. Blank lines and the ones
+    *   starting with '#' are skipped.
+    *
+    *   The enhanced engine analyses the boards in bulk, chunk by chunk, so a never ending stream may be piped
+    *   through it. Thus, among several optimal movements, the one printed may not be the first one in
+    *   row-major order. Every board must have the same shape as the first one.
+    *
+    *   Usage: python -m engine_cli [--engine enhanced|legacy] [--machine o] [--human x] < boards.txt
+    *          python -m engine_cli --demo
+    *          python -m engine_cli --import-time
+    *
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+# seconds importing an engine may take, the interpreter start up excluded.
+IMPORT_TIME_BUDGET = 0.05
+ENGINE_MODULES = {'enhanced': 'enhanced_machine_player', 'legacy': 'machine_player'}
+
+# boards the engines used to solve whenever they were imported.
+DEMO_BOARDS = (
+    'o_x/xoo/_x_',
+    'o_x/xo_/o_x',
+    '___/___/___',
+    # the machine gives up
+    'xxo/_o_/___',
+    'oox/_x_/___',
+)
+
+
+def parse_board(line):
+    """ It turns a line into a nested list board. """
+    line = line.strip()
+    if '/' in line:
+        rows = line.split('/')
+    elif len(line) == 9:
+        rows = [line[0:3], line[3:6], line[6:9]]
+    else:
+        raise ValueError(f'{line!r} is not a board, the rows must be separated by /')
+    if any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError(f'{line!r} is not a board, every row must have the same length')
+    return [list(row) for row in rows]
+
+
+def read_boards(stream):
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield parse_board(line)
+
+
+def format_move(move):
+    return '-' if move is None else f'{move[0]} {move[1]}'
+
+
+def solve(boards, engine='enhanced', machine='o', human='x', **options):
+    """
+    :param boards: iterable of nested list boards, the machine being the one to move.
+    :param options: keyword arguments handed to the enhanced MachinePlayer, such as max_depth or time_limit.
+    :return: a generator of the movements, one for each board and in the same order.
+    """
+    if engine == 'legacy':
+        from machine_player import MachinePlayer
+        for board in boards:
+            # the legacy engine only knows the 3 x 3 board.
+            if len(board) != 3 or len(board[0]) != 3:
+                raise ValueError('the legacy engine only plays on 3 x 3 boards')
+            yield MachinePlayer(board, machine, human).get_optimal_move()
+        return
+    from enhanced_machine_player import MachinePlayer
+    boards = iter(boards)
+    first = next(boards, None)
+    if first is None:
+        return
+    player = MachinePlayer(first, machine, human, **options)
+
+    def same_shape():
+        yield first
+        for board in boards:
+            if len(board) != len(first) or len(board[0]) != len(first[0]):
+                raise ValueError(f'every board must be {len(first)} x {len(first[0])}')
+            yield board
+
+    with player:
+        for move, value in player.get_optimal_moves(same_shape()):
+            yield move
+
+
+def import_time(module):
+    """ It imports the module within a fresh interpreter and returns the seconds it took. """
+    code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output.split()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m engine_cli',
+                                     description='Optimal movements of the tic tac toe machine player.')
+    parser.add_argument('--engine', choices=sorted(ENGINE_MODULES), default='enhanced')
+    parser.add_argument('--machine', default='o', help='token of the machine, the one to move')
+    parser.add_argument('--human', default='x', help='token of the human')
+    parser.add_argument('--win-length', type=int, default=3)
+    parser.add_argument('--max-depth', type=int)
+    parser.add_argument('--time-limit', type=float, help='seconds each search may take')
+    parser.add_argument('--no-tablebase', action='store_true')
+    parser.add_argument('--demo', action='store_true', help='solve the demo boards instead of reading stdin')
+    parser.add_argument('--import-time', action='store_true',
+                        help=f'check that importing each engine takes less than {IMPORT_TIME_BUDGET} seconds')
+    args = parser.parse_args(argv)
+
+    if args.import_time:
+        status = 0
+        for module in ENGINE_MODULES.values():
+            # the first import may have to compile the module, so the best of a few ones is kept.
+            elapsed = min(import_time(module) for _ in range(0, 3))
+            over = elapsed > IMPORT_TIME_BUDGET
+            status |= over
+            print(f'{module}: {elapsed * 1000:.1f} ms{" over the budget" if over else ""}')
+        return status
+
+    options = {}
+    if args.engine == 'enhanced':
+        options = {'win_length': args.win_length, 'max_depth': args.max_depth, 'time_limit': args.time_limit,
+                   'use_tablebase': not args.no_tablebase}
+    start = time.perf_counter()
+    count = 0
+    try:
+        if args.demo:
+            # the demo boards are printed next to their movements, and they are solved one by one since
+            # each one has a different optimal movement to show.
+            for board in DEMO_BOARDS:
+                move = next(solve([parse_board(board)], args.engine, args.machine, args.human, **options))
+                print(board, format_move(move))
+                count += 1
+        else:
+            for move in solve(read_boards(sys.stdin), args.engine, args.machine, args.human, **options):
+                print(format_move(move))
+                count += 1
+    except ValueError as error:
+        print(f'error: {error}', file=sys.stderr)
+        return 2
+    print(f'{count} boards in {time.perf_counter() - start:.3f} s', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,3 @@
-import copy
-
 """
     *
     *   Author: Diego Fernandez Sebastian
@@ -16,41 +14,635 @@ import copy
     *                              (1, 0) (1, 1) (1, 2)
     *                              (2, 0) (2, 1) (2, 2)
     *
+    *   Bigger boards are supported as well (4 x 4, 5 x 5 connect 4 and so on). Whenever the whole tree cannot
+    *   be searched, the search is limited in depth and the non ending states are scored by a heuristic
+    *   evaluation which always lies between 1 and 3. A time limit may be set to guarantee the reply latency.
+    *   For those boards a Monte Carlo Tree Search backend may be chosen instead of the alpha-beta-pruning, see
+    *   mcts.
+    *
 """
+import random
+import time
+from functools import lru_cache
+from itertools import islice
+
+from position_index import batch_board_masks, board_masks, is_ndarray, mask_to_board
+from search_core import SearchCore, SearchStats, SearchTimeout, notify_stats_hooks, \
+    stats_hooks_registered
+from tablebase import load_tablebase
+from transposition_table import EXACT, INVERSE_SYMMETRY_CELLS, canonical_key, canonical_symmetry, default_table, \
+    lookup, store_result, symmetry_tables
+from win_detection import batch_status, cell_line_masks, line_masks, winning_mask_table
+
+
+# Whenever the root has more empty cells than this, the whole tree is not searched.
+FULL_SEARCH_LIMIT = 10
+# Depth used when the whole tree cannot be searched and no other limit has been set.
+DEFAULT_MAX_DEPTH = 4
+# Only boards up to this number of cells get a table telling which masks contain a winning line.
+WINNING_TABLE_LIMIT = 9
+# Weight of a line which only holds tokens of one player, according to how many tokens it holds.
+LINE_WEIGHT_BASE = 4
+# The greater it is, the closer the heuristic evaluation stays to 2 (tie).
+HEURISTIC_SCALE = 64
+# Boards analysed at a time by get_optimal_moves.
+BATCH_CHUNK_SIZE = 1024
+# Search backends of the machine player.
+ALPHA_BETA = 'alphabeta'
+MCTS = 'mcts'
+# Seconds the parallel search waits for a child before checking again whether it has been cancelled.
+CANCEL_POLL_INTERVAL = 0.001
 
 
 class MachinePlayer:
-    def __init__(self, board, machine_token, human_token, machine_turn=True):
+    def __init__(self, board, machine_token, human_token, machine_turn=True, table=default_table,
+                 use_tablebase=True, win_length=3, max_depth=None, time_limit=None, rows=3, cols=3,
+                 move_ordering=True, workers=1, collect_stats=False, backend=ALPHA_BETA, playouts=None, seed=None):
+        """ :param board: nested list board of any size. If it's None, an empty board of rows x cols is used.
+            :param table: transposition table kept across the searches. By default, the one shared by every
+                machine player is used. None disables it.
+            :param use_tablebase: whether the precomputed tablebase is looked up before searching. The search
+                is only carried out if the tablebase file is missing or it does not contain the position.
+                It's only available for the 3 x 3 board.
+            :param win_length: number of tokens in a row needed to win.
+            :param max_depth: maximum number of moves searched ahead. None searches the whole tree if the board
+                is small enough, otherwise DEFAULT_MAX_DEPTH is used.
+            :param time_limit: seconds each search may take. The depth is increased one move at a time and the
+                best movement of the deepest search completed within the time is returned. It may be overridden
+                for a single movement by get_optimal_move.
+            :param move_ordering: whether the iterative deepening searches first the previous best movement,
+                the killer moves and the moves with the best history. Otherwise, the row-major order is used.
+                The whole tree search is always carried out in row-major order.
+            :param workers: number of processes the children of the root are split among. With more than one,
+                the root is searched in row-major order, without iterative deepening unless a time limit is set.
+                Among several optimal movements, the first one in row-major order is returned: the same as the
+                serial search without move_ordering. With move_ordering, the serial search may return another
+                movement of the same value. The processes are kept alive between movements until close is
+                called.
+            :param collect_stats: whether the counters of the search are gathered for every movement. They are
+                gathered as well whenever a hook has been registered with search_core.register_stats_hook.
+            :param backend: ALPHA_BETA or MCTS. The Monte Carlo Tree Search plays random games instead of
+                evaluating the positions, it neither uses the tablebase nor the transposition table. With more
+                than one worker, its playouts are split among the processes.
+            :param playouts: playouts of each MCTS search. By default, mcts.DEFAULT_PLAYOUTS unless the search
+                is limited in time or it may be cancelled, in which case it plays until it's stopped. Whenever
+                the player is asked again later in the same game, the tree of its previous movement is kept and
+                the playouts it already holds count too.
+            :param seed: seed of the MCTS playouts, so the movements may be reproduced.
+        """
+        if backend not in (ALPHA_BETA, MCTS):
+            raise ValueError(f'unknown backend {backend}, expected {ALPHA_BETA} or {MCTS}')
+        if board is None:
+            board = [['_' for _ in range(0, cols)] for _ in range(0, rows)]
         self.__current_board = board
         self.__machine_token = machine_token
         self.__human_token = human_token
         self.__machine_turn = machine_turn
+        self.__table = table
+        self.__use_tablebase = use_tablebase
+        self.__geometry = get_geometry(len(board), len(board[0]), win_length)
+        self.__max_depth = max_depth
+        self.__time_limit = time_limit
+        self.__move_ordering = move_ordering
+        self.__nodes_per_depth = []
+        self.__workers = workers
+        self.__executor = None
+        self.__shared_alpha = None
+        self.__shared_stop = None
+        self.__collect_stats = collect_stats
+        self.__last_stats = None
+        self.__backend = backend
+        self.__playouts = playouts
+        # it draws the seed of each MCTS search, so a game may be reproduced from the player's seed.
+        self.__random = random.Random(seed)
+        # kept between the movements, so the search of the next one starts with what this one learned.
+        self.__ordering = None
+        # (root, machine mask, human mask) of the last MCTS tree.
+        self.__mcts_tree = None
 
     @property
     def current_board(self):
         return self.__current_board
 
-    def get_optimal_move(self):
+    @property
+    def transposition_table(self):
+        return self.__table
+
+    @property
+    def geometry(self):
+        return self.__geometry
+
+    @property
+    def nodes_per_depth(self):
+        """ Nodes searched by each iteration of the last iterative deepening, as (depth, nodes) tuples. """
+        return self.__nodes_per_depth
+
+    @property
+    def last_stats(self):
+        """ SearchStats of the last movement found by get_optimal_move, None if they were not gathered. """
+        return self.__last_stats
+
+    def close(self):
+        """ It shuts down the processes used by the parallel search, if any. """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+            self.__shared_alpha = None
+            self.__shared_stop = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_optimal_move(self, time_limit=None, deadline=None, cancel=None):
         """
         Returns the coordinates in which the player must place the token
         It may face a situation where more than one is the optimal movement. It will return
         the first optimal movement.
+        Whenever the search is limited in time or it may be cancelled, the depth is increased one move at a
+        time and the best movement of the deepest iteration completed is returned once the search is stopped.
+        The first iteration, one move ahead, always completes, thus a movement is always returned.
+        :param time_limit: seconds the search may take, counted from the call. By default, the player's one.
+        :param deadline: time.perf_counter() value at which the search is stopped. If both are given, the
+            earliest one is used.
+        :param cancel: CancellationToken, threading.Event or any object with an is_set method, which stops the
+            search once it's set.
         :return: an optimal movement.
         """
+        start = time.perf_counter()
+        deadline = self.__deadline(start, time_limit, deadline)
         # create the root state
-        root = State(self.current_board, True, self.__machine_token, self.__human_token)
-        # alpha-beta-pruning algorithm
-        best_move = max_value_a_b(root, depth(root), -1000, 1000)
-        # obtain the direct children.
-        direct_children = get_direct_children(root, all_states_generated)
-        # obtain the coordinates of the movement.
-        for direct_child in direct_children:
-            if direct_child.value == best_move:
-                return get_coordinates(root, direct_child)
+        root = State(self.current_board, True, self.__machine_token, self.__human_token, geometry=self.__geometry)
+        if not self.__collect_stats and not stats_hooks_registered():
+            return self.__solve(root, cancel=cancel, deadline=deadline)[0]
+        stats = SearchStats()
+        move = self.__solve(root, stats=stats, cancel=cancel, deadline=deadline)[0]
+        stats.elapsed = time.perf_counter() - start
+        self.__last_stats = stats
+        notify_stats_hooks(stats)
+        return move
+
+    def __deadline(self, start, time_limit=None, deadline=None):
+        if time_limit is None:
+            time_limit = self.__time_limit
+        if time_limit is not None:
+            deadline = start + time_limit if deadline is None else min(deadline, start + time_limit)
+        return deadline
+
+    def get_optimal_moves(self, boards, chunk_size=BATCH_CHUNK_SIZE):
+        """
+        It analyses a batch of boards of the same shape as the player's one, the machine being the one to move.
+        The boards are handled chunk by chunk, so it may be fed with a never ending stream.
+        Within a chunk, the 3 x 3 boards that are symmetric to each other are only solved once, and the movement
+        is mapped back through the symmetry. Thus, among several optimal movements, the one returned may not be
+        the first one in row-major order.
+        :param boards: iterable of nested list boards, or a NumPy array shaped (boards, rows, cols).
+        :param chunk_size: number of boards handled at a time.
+        :return: a generator of tuples (movement, value), one for each board and in the same order. The movement
+            is None if the game is over. The value is the one of the static evaluation: 1, 2 or 3, or a
+            heuristic value in between if the whole tree cannot be searched.
+        """
+        geometry = self.__geometry
+        tokens = (self.__machine_token, self.__human_token)
+        tablebase = load_tablebase() if self.__use_tablebase and geometry is DEFAULT_GEOMETRY else None
+        for chunk in _chunks(boards, chunk_size):
+            machine_masks, human_masks = batch_board_masks(chunk, *tokens)
+            (machine_wins, human_wins), full = batch_status((machine_masks, human_masks), geometry.rows,
+                                                            geometry.cols, geometry.win_length)
+            # key of the position --> (cell, value) of the position the key stands for.
+            solved = {}
+            for index in range(0, len(machine_masks)):
+                machine_mask = int(machine_masks[index])
+                human_mask = int(human_masks[index])
+                if human_wins[index]:
+                    yield None, 1
+                    continue
+                if machine_wins[index]:
+                    yield None, 3
+                    continue
+                if full[index]:
+                    yield None, 2
+                    continue
+                if tablebase is not None:
+                    entry = tablebase.lookup(machine_mask, human_mask)
+                    if entry is not None:
+                        yield divmod(entry[1], 3), entry[0]
+                        continue
+                if geometry is DEFAULT_GEOMETRY:
+                    # the canonical board is solved, so every symmetric board shares its result.
+                    symmetry = canonical_symmetry(machine_mask, human_mask)
+                    machine_mask = symmetry_tables()[symmetry][machine_mask]
+                    human_mask = symmetry_tables()[symmetry][human_mask]
+                key = (machine_mask, human_mask)
+                if key not in solved:
+                    root = State.from_masks(machine_mask, human_mask, True, self.__machine_token,
+                                            self.__human_token, geometry=geometry)
+                    move, value = self.__solve(root, False, deadline=self.__deadline(time.perf_counter()))
+                    solved[key] = move[0] * geometry.cols + move[1], value
+                cell, value = solved[key]
+                if geometry is DEFAULT_GEOMETRY:
+                    cell = INVERSE_SYMMETRY_CELLS[symmetry][cell]
+                yield divmod(cell, geometry.cols), value
+
+    def __solve(self, root, use_tablebase=True, stats=None, cancel=None, deadline=None):
+        """
+        :param stats: SearchStats updated by the search, if any.
+        :param cancel: event which stops the search once it's set.
+        :param deadline: time.perf_counter() value at which the search is stopped.
+        :return: the tuple (movement, value) of the root. The movement is None if the game is over.
+        """
+        if use_tablebase and self.__use_tablebase and self.__geometry is DEFAULT_GEOMETRY and \
+                self.__backend == ALPHA_BETA:
+            tablebase = load_tablebase()
+            if tablebase is not None:
+                entry = tablebase.lookup(root.machine_mask, root.human_mask)
+                if entry is not None:
+                    if stats is not None:
+                        stats.tablebase_hits += 1
+                    return None if entry[1] is None else divmod(entry[1], 3), entry[0]
+        # if the game is over, there is no movement to perform.
+        if root.ending_state():
+            return None, root.static_evaluation()
+        if self.__backend == MCTS:
+            return self.__mcts_solve(root, deadline, cancel, stats)
+        remaining_depth = depth(root)
+        if self.__max_depth is not None:
+            search_depth = min(self.__max_depth, remaining_depth)
+        elif remaining_depth > FULL_SEARCH_LIMIT:
+            # the whole tree is too big to be searched
+            search_depth = DEFAULT_MAX_DEPTH
+        else:
+            search_depth = remaining_depth
+
+        if self.__workers > 1:
+            return self.__parallel_solve(root, search_depth, deadline, stats, cancel)
+
+        if deadline is None and cancel is None and search_depth == remaining_depth:
+            # the whole tree is searched in place, making and unmaking the movements over a single board.
+            core = SearchCore(root.geometry, self.__table, stats=stats)
+            best_value, best_cell, completed = core.search_root(root.machine_mask, root.human_mask, search_depth)
+            return divmod(best_cell, root.geometry.cols), best_value
+
+        if self.__ordering is None:
+            self.__ordering = MoveOrdering(root.geometry, enabled=self.__move_ordering)
+        else:
+            self.__ordering.new_search()
+        ordering = self.__ordering
+        # a search which may be cancelled deepens one move at a time, so there is always a movement to return.
+        best_value, best_child = iterative_deepening(root, search_depth, self.__table, deadline, ordering, stats,
+                                                     cancel)
+        self.__nodes_per_depth = ordering.nodes_per_depth
+        return get_coordinates(root, best_child), best_value
+
+    def __pool(self):
+        """ It starts the process pool the first time it's needed. """
+        if self.__executor is None:
+            # the process pool is only imported when it's needed, so importing the module stays cheap.
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # the processes get the shared alpha and the stop flag when they are started.
+            self.__shared_alpha = multiprocessing.Value('d', -1000.0)
+            self.__shared_stop = multiprocessing.RawValue('b', 0)
+            self.__executor = ProcessPoolExecutor(max_workers=self.__workers, initializer=_init_worker,
+                                                  initargs=(self.__shared_alpha, self.__shared_stop))
+        return self.__executor
+
+    def __parallel_solve(self, root, search_depth, deadline, stats=None, cancel=None):
+        """ The children of the root are searched by a pool of processes. """
+        self.__pool()
+        # without a deadline, the shallower searches would not help the deepest one.
+        depths = range(1, search_depth + 1) if deadline is not None or cancel is not None else (search_depth,)
+        best_value = None
+        best_child = None
+        for current_depth in depths:
+            value, child, completed = parallel_search_root(root, current_depth, self.__executor,
+                                                           self.__shared_alpha, self.__table is not None,
+                                                           deadline, stats, cancel, self.__shared_stop)
+            if completed or best_child is None:
+                best_value = value
+                best_child = child
+            if not completed:
+                break
+        return get_coordinates(root, best_child), best_value
+
+    def __mcts_solve(self, root, deadline, cancel, stats=None):
+        """ The Monte Carlo Tree Search backend, see mcts. """
+        from mcts import DEFAULT_PLAYOUTS, MonteCarloSearch, best_root_child, descend_tree, merge_root_children
+        geometry = root.geometry
+        playouts = self.__playouts
+        if playouts is None and deadline is None and cancel is None:
+            playouts = DEFAULT_PLAYOUTS
+        if self.__workers > 1:
+            # a batch of playouts for each process, every one of them growing its own tree.
+            executor = self.__pool()
+            self.__shared_stop.value = 0
+            batch = None if playouts is None else -(-playouts // self.__workers)
+            futures = [executor.submit(_search_playouts, root.machine_mask, root.human_mask, geometry.rows,
+                                       geometry.cols, geometry.win_length, batch, self.__random.getrandbits(32),
+                                       deadline) for _ in range(0, self.__workers)]
+            results = [future.result() if cancel is None else _wait_cancellable(future, cancel, self.__shared_stop)
+                       for future in futures]
+            children = merge_root_children(children for children, _, _ in results)
+            total_playouts = sum(done for _, done, _ in results)
+            nodes = sum(nodes for _, _, nodes in results)
+        else:
+            search = MonteCarloSearch(geometry, self.__random.getrandbits(32))
+            # the tree of the previous movement is kept if the position has been reached from it.
+            tree = None
+            if self.__mcts_tree is not None:
+                tree = descend_tree(*self.__mcts_tree, root.machine_mask, root.human_mask)
+            children = search.search(root.machine_mask, root.human_mask, playouts, deadline, cancel, tree)
+            self.__mcts_tree = search.root, root.machine_mask, root.human_mask
+            total_playouts = search.playouts
+            nodes = search.nodes
+        if stats is not None:
+            stats.nodes += nodes
+            stats.leaf_evaluations += total_playouts
+        cell, value = best_root_child(children)
+        return divmod(cell, geometry.cols), value
+
+
+# alpha shared by the processes of the parallel search. It's set up when each process starts.
+_shared_alpha = None
+# cancellation seen by the processes of the parallel search, it's set up along with the alpha.
+_shared_cancel = None
+# a child within this margin of the shared alpha is still searched exactly, so ties are broken like
+# the serial search does: the first child in row-major order.
+SHARED_ALPHA_MARGIN = 1e-9
+
+
+class _SharedFlag:
+    """ It reads a flag in shared memory as a cancellation token. """
+    __slots__ = ('flag',)
+
+    def __init__(self, flag):
+        self.flag = flag
+
+    def is_set(self):
+        return self.flag.value != 0
+
+
+def _init_worker(shared_alpha, shared_stop):
+    global _shared_alpha, _shared_cancel
+    _shared_alpha = shared_alpha
+    _shared_cancel = _SharedFlag(shared_stop)
+
+
+def _search_child(machine_mask, human_mask, rows, cols, win_length, depth, use_table, deadline,
+                  collect_stats=False):
+    """ It searches a root child, the human to move, and returns (value, exact, stats) or None once stopped. """
+    # the process keeps its own transposition table between the searches, stats is only kept on collect_stats.
+    child = State.from_masks(machine_mask, human_mask, False, geometry=get_geometry(rows, cols, win_length))
+    alpha = _shared_alpha.value - SHARED_ALPHA_MARGIN
+    stats = None
+    if collect_stats:
+        stats = SearchStats()
+        stats.root_depth = depth
+    try:
+        value = min_value_a_b(child, depth - 1, alpha, 1000, default_table if use_table else None, deadline,
+                              stats=stats, cancel=_shared_cancel)
+    except SearchTimeout:
+        return None
+    exact = value > alpha
+    if exact:
+        # the later children may be pruned against it.
+        with _shared_alpha.get_lock():
+            if value > _shared_alpha.value:
+                _shared_alpha.value = value
+    return value, exact, stats
+
+
+def _search_playouts(machine_mask, human_mask, rows, cols, win_length, playouts, seed, deadline):
+    """
+    A batch of MCTS playouts run by a process of the pool, over its own tree.
+    :return: the tuple (root children, playouts, nodes), see mcts.MonteCarloSearch.search.
+    """
+    from mcts import MonteCarloSearch
+    search = MonteCarloSearch(get_geometry(rows, cols, win_length), seed)
+    children = search.search(machine_mask, human_mask, playouts, deadline, _shared_cancel)
+    return children, search.playouts, search.nodes
+
+
+def parallel_search_root(root, depth, executor, shared_alpha, use_table=True, deadline=None, stats=None,
+                         cancel=None, shared_stop=None):
+    """
+    Like search_root, but every child of the root is handed to the process pool. The best value found so far
+    is shared among the processes, so the children searched later can still be pruned.
+    :param cancel: token which stops the search once it's set. It's passed on to the processes through
+        shared_stop, the flag they were started with.
+    :return: the tuple (best value, best child, completed).
+    """
+    with shared_alpha.get_lock():
+        shared_alpha.value = -1000.0
+    if shared_stop is not None:
+        shared_stop.value = 0
+    geometry = root.geometry
+    children = list(root.generate_children())
+    futures = [executor.submit(_search_child, child.machine_mask, child.human_mask, geometry.rows, geometry.cols,
+                               geometry.win_length, depth, use_table, deadline, stats is not None)
+               for child in children]
+    if stats is not None:
+        stats.nodes += 1
+    best_value = -1000
+    best_child = None
+    completed = True
+    for child, future in zip(children, futures):
+        if cancel is None:
+            result = future.result()
+        else:
+            result = _wait_cancellable(future, cancel, shared_stop)
+        if result is None:
+            completed = False
+            continue
+        if stats is not None:
+            stats.merge(result[2])
+        if result[1] and result[0] > best_value:
+            # only the exact values may be the best ones, the rest are upper bounds below it.
+            best_value = result[0]
+            best_child = child
+    if best_child is None:
+        # not even one child could be searched, any movement is better than none.
+        best_child = children[0]
+    return best_value, best_child, completed
+
+
+def _wait_cancellable(future, cancel, shared_stop):
+    """ It waits for the result of a child, telling the processes to stop once the search is cancelled. """
+    from concurrent.futures import wait
+    # wait() doesn't raise on the timeout, whose exception class differs between the Python versions.
+    while not wait([future], timeout=CANCEL_POLL_INTERVAL).done:
+        if cancel.is_set() and shared_stop is not None:
+            shared_stop.value = 1
+    return future.result()
+
+
+def _chunks(boards, chunk_size):
+    """ It splits the boards into chunks, without reading the whole iterable beforehand. """
+    if is_ndarray(boards):
+        for start in range(0, len(boards), chunk_size):
+            yield boards[start:start + chunk_size]
+        return
+    iterator = iter(boards)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class MoveOrdering:
+    def __init__(self, geometry, enabled=True):
+        """
+        It sorts the movements of every node searched by the iterative deepening. The cells are tried in order:
+            --> the best movement of the previous iteration at the root, elsewhere the one of the transposition
+                table entry of the node, even though it was searched shallower: the previous iterations, or
+                the search of the previous movement of the game, stored it.
+            --> the killer moves: the last movements which caused a cutoff at the same depth.
+            --> the history: how many cutoffs, weighted by the depth, each movement has caused so far.
+            --> the prior: the number of winning lines going through the cell (center, then corners).
+        :param enabled: if it's False, the row-major order is kept and only the nodes get counted.
+        """
+        self.enabled = enabled
+        self.cell_bits = geometry.cell_bits
+        self.prior = {geometry.cell_bits[cell]: len(lines) for cell, lines in enumerate(geometry.cell_lines)}
+        # a history for each player, the machine one is the first.
+        self.history = ({}, {})
+        # two killer moves for each ply
+        self.killers = [[] for _ in range(0, geometry.cells + 1)]
+        self.best_move = None
+        self.iteration_depth = 0
+        self.nodes = 0
+        self.nodes_per_depth = []
+
+    def new_search(self):
+        """
+        It gets ready for the search of the next movement of the same game. The history is kept, halved so the
+        latest cutoffs weigh more, while the killer moves and the best movement belonged to the previous root.
+        """
+        for history in self.history:
+            for move in history:
+                history[move] //= 2
+        for killers in self.killers:
+            killers.clear()
+        self.best_move = None
+        self.nodes_per_depth = []
+
+    def start_iteration(self, depth):
+        self.iteration_depth = depth
+        self.nodes = 0
+
+    def end_iteration(self):
+        self.nodes_per_depth.append((self.iteration_depth, self.nodes))
+
+    def ordered_moves(self, state, depth, hash_move=None):
+        """
+        It returns the bits of the empty cells sorted in the order they must be searched.
+        :param hash_move: bit of the best movement the transposition table holds for the state, if any.
+        """
+        occupied = state.occupied_mask
+        moves = [cell for cell in self.cell_bits if not occupied & cell]
+        if not self.enabled:
+            return moves
+        ply = self.iteration_depth - depth
+        killers = self.killers[ply]
+        history = self.history[0 if state.machine_turn else 1]
+        prior = self.prior
+        best_move = self.best_move if ply == 0 else None
+        if best_move is None:
+            best_move = hash_move
+        moves.sort(key=lambda cell: (cell != best_move, cell not in killers, -history.get(cell, 0), -prior[cell]))
+        return moves
+
+    def cutoff(self, state, move, depth):
+        """ It records the movement which has caused a cutoff. """
+        if not self.enabled:
+            return
+        killers = self.killers[self.iteration_depth - depth]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        history = self.history[0 if state.machine_turn else 1]
+        history[move] = history.get(move, 0) + depth * depth
+
+
+class Geometry:
+    def __init__(self, rows=3, cols=3, win_length=3):
+        """ Shape of the board: rows x cols cells where win_length tokens in a row are needed to win.
+            The cell (i, j) is mapped to the bit i * cols + j of the players' masks.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.win_length = win_length
+        self.cells = rows * cols
+        self.cell_bits = tuple(1 << cell for cell in range(0, self.cells))
+        self.full_board = (1 << self.cells) - 1
+        self.lines = line_masks(rows, cols, win_length)
+        self.cell_lines = cell_line_masks(rows, cols, win_length)
+        # Whether a player mask contains a winning line. For small boards all the masks are worked out
+        # beforehand and a win check becomes a single lookup.
+        self.winning_boards = winning_mask_table(rows, cols, win_length) if self.cells <= WINNING_TABLE_LIMIT \
+            else None
+        self.line_weights = tuple(0 if count == 0 else LINE_WEIGHT_BASE ** (count - 1)
+                                  for count in range(0, win_length + 1))
+
+    def is_win(self, mask):
+        """ It checks whether the mask contains any winning line. """
+        if self.winning_boards is not None:
+            return self.winning_boards[mask]
+        for line in self.lines:
+            if mask & line == line:
+                return True
+        return False
+
+    def evaluate(self, machine_mask, human_mask):
+        """ The static evaluation of the board: 1 the human has won, 3 the machine has, 2 tie. """
+        if self.is_win(human_mask):
+            return 1
+        elif self.is_win(machine_mask):
+            return 3
+        elif machine_mask | human_mask == self.full_board:
+            # if no solution has been found, 2 Tie
+            return 2
+        # the search has been cut before the end of the game
+        return self.heuristic(machine_mask, human_mask)
+
+    def heuristic(self, machine_mask, human_mask):
+        """
+        It scores a non ending board within the open interval (1, 3). Every line which only holds tokens of
+        one player adds (machine) or subtracts (human) a weight growing with the number of tokens it holds.
+        """
+        weights = self.line_weights
+        score = 0
+        for line in self.lines:
+            machine_line = machine_mask & line
+            human_line = human_mask & line
+            if machine_line and not human_line:
+                score += weights[bin(machine_line).count('1')]
+            elif human_line and not machine_line:
+                score -= weights[bin(human_line).count('1')]
+        return 2 + score / (abs(score) + HEURISTIC_SCALE)
+
+    def key(self, machine_mask, human_mask, machine_turn):
+        """ Key of the position within the transposition table. """
+        return canonical_key(machine_mask, human_mask, machine_turn, self.rows, self.cols, self.win_length)
+
+
+@lru_cache(maxsize=None)
+def get_geometry(rows=3, cols=3, win_length=3):
+    """ The geometries are built once and shared by every state of the same board shape. """
+    return Geometry(rows, cols, win_length)
+
+
+DEFAULT_GEOMETRY = get_geometry(3, 3, 3)
 
 
 class State:
-    def __init__(self, board, machine_turn, machine="O", human="X", value=0):
+    # the state only carries both masks and a few flags, thus no per instance dictionary is needed.
+    __slots__ = ('__machine_mask', '__human_mask', '__value', '__machine', '__human', '__machine_turn', '__geometry')
+
+    def __init__(self, board, machine_turn, machine="O", human="X", value=0, geometry=DEFAULT_GEOMETRY):
         """ :param board: whatever valid configuration within the board possible.
             :param machine: Character used by the machine in the game
             :param human: Character used by the human in the game
@@ -60,12 +652,17 @@ class State:
                     --> 1: it's used for the minimizing player
                     --> 2: it's used for a tie
                     --> 3: it's used for the maximizing player
+                A value strictly between 1 and 3 is the heuristic evaluation of a state which is not ending.
+            :param geometry: shape of the board, by default the 3 x 3 one.
+            The board is not stored as a nested list. Each player owns an integer bitmask where the
+            bit i * cols + j is set whenever the player has a token placed in the cell (i, j).
         """
         if board is not None:
-            # the board will be none only for the "root" state.
-            self.__board = board
+            self.__machine_mask, self.__human_mask = board_masks(board, machine, human)
         else:
-            self.__board = [['_', '_', '_'], ['_', '_', '_'], ['_', '_', '_']]
+            # the board will be none only for the "root" state.
+            self.__machine_mask = 0
+            self.__human_mask = 0
         # given value to every state. It will be used to set which player has won / whether it's a tie and so on.
         # a predefined value is set to 0. It may change due to the static evaluation carried out.
         self.__value = value
@@ -74,10 +671,43 @@ class State:
         self.__human = human
         # Furthermore, to be able to generate the proper children, two more attributes are needed.
         self.__machine_turn = machine_turn
+        self.__geometry = geometry
+
+    @classmethod
+    def from_masks(cls, machine_mask, human_mask, machine_turn, machine="O", human="X", value=0,
+                   geometry=DEFAULT_GEOMETRY):
+        """ It builds a state straight from both bitmasks, avoiding the conversion of a nested board. """
+        state = cls.__new__(cls)
+        state.__machine_mask = machine_mask
+        state.__human_mask = human_mask
+        state.__value = value
+        state.__machine = machine
+        state.__human = human
+        state.__machine_turn = machine_turn
+        state.__geometry = geometry
+        return state
 
     @property
     def board(self):
-        return self.__board
+        """ The nested list board is rebuilt on demand from the bitmasks. """
+        return mask_to_board(self.__machine_mask, self.__human_mask, self.__machine, self.__human,
+                             self.__geometry.rows, self.__geometry.cols)
+
+    @property
+    def machine_mask(self):
+        return self.__machine_mask
+
+    @property
+    def human_mask(self):
+        return self.__human_mask
+
+    @property
+    def occupied_mask(self):
+        return self.__machine_mask | self.__human_mask
+
+    @property
+    def geometry(self):
+        return self.__geometry
 
     @property
     def value(self):
@@ -95,26 +725,26 @@ class State:
     def machine_turn(self, update):
         self.__machine_turn = update
 
-    def generate_children(self):
-        """ It's a generator which produces one child at a time. """
+    def generate_children(self, moves=None):
+        """ It's a generator which produces one child at a time.
+            :param moves: bits of the cells to be tried, in order. By default, every cell in row-major order.
+        """
+        machine_mask = self.__machine_mask
+        human_mask = self.__human_mask
+        occupied = machine_mask | human_mask
+        geometry = self.__geometry
         # loop over the board in order to obtain all the possible options.
-        for i in range(0, len(self.board)):
-            for j in range(0, len(self.board[0])):
-                if check_board_position(self, i, j):
-                    # it's possible to place a token, therefore the board must be copied.
-                    child = copy.deepcopy(self)
-                    if self.machine_turn:
-                        # the machine is playing, therefore the token used is the machine one.
-                        child.board[i][j] = self.__machine
-                        # change the turn
-                        child.machine_turn = False
-                    else:
-                        # otherwise the human is playing
-                        child.board[i][j] = self.__human
-                        # change the turn
-                        child.machine_turn = True
-                    # yield the child on demand
-                    yield child
+        for cell in geometry.cell_bits if moves is None else moves:
+            if not occupied & cell:
+                # it's possible to place a token, only two integers must be copied.
+                if self.__machine_turn:
+                    # the machine is playing, therefore the token used is the machine one.
+                    yield State.from_masks(machine_mask | cell, human_mask, False, self.__machine, self.__human,
+                                           0, geometry)
+                else:
+                    # otherwise the human is playing
+                    yield State.from_masks(machine_mask, human_mask | cell, True, self.__machine, self.__human,
+                                           0, geometry)
 
     def ending_state(self):
         """
@@ -124,111 +754,26 @@ class State:
 
         :return: True if any of this constraints are true, otherwise false.
         """
+        geometry = self.__geometry
         # constraint 1:
-        if check_board_cells(self):
+        if self.__machine_mask | self.__human_mask == geometry.full_board:
             return True
 
         # constraint 2:
-        value_mdh, token = self._check_main_diagonal(self.__human)
-        value_mdm, token = self._check_main_diagonal(self.__machine)
-        value_sdh, token = self._check_secondary_diagonal(self.__human)
-        value_sdm, token = self._check_secondary_diagonal(self.__machine)
-        value_rh, token = self._check_rows(self.__human)
-        value_rm, token = self._check_rows(self.__machine)
-        value_ch, token = self._check_cols(self.__human)
-        value_cm, token = self._check_cols(self.__machine)
-        if value_mdh or value_mdm or value_sdh or value_sdm or value_rh or value_rm or value_ch or value_cm:
-            return True
-
-        return False
+        winning_boards = geometry.winning_boards
+        if winning_boards is not None:
+            return winning_boards[self.__human_mask] or winning_boards[self.__machine_mask]
+        return geometry.is_win(self.__human_mask) or geometry.is_win(self.__machine_mask)
 
     def static_evaluation(self):
         """ The machine is going to maximize every time.
             In order to come up with a fast move,
             """
+        return self.__geometry.evaluate(self.__machine_mask, self.__human_mask)
 
-        # check the main diagonals first
-        value_i, token_i = self._check_main_diagonal(self.__human)
-        value_j, token_j = self._check_main_diagonal(self.__machine)
-        if value_i and token_i == self.__human:
-            return 1
-        elif value_j and token_j == self.__machine:
-            return 3
-
-        # check the secondary diagonals
-        value_i, token_i = self._check_secondary_diagonal(self.__human)
-        value_j, token_j = self._check_secondary_diagonal(self.__machine)
-        if value_i and token_i == self.__human:
-            return 1
-        elif value_j and token_j == self.__machine:
-            return 3
-
-        # secondly check the columns
-        value_i, token_i = self._check_rows(self.__human)
-        value_j, token_j = self._check_rows(self.__machine)
-        if value_i and token_i == self.__human:
-            return 1
-        elif value_j and token_j == self.__machine:
-            return 3
-
-        # lastly check the rows
-        value_i, token_i = self._check_cols(self.__human)
-        value_j, token_j = self._check_cols(self.__machine)
-        if value_i and token_i == self.__human:
-            return 1
-        elif value_j and token_j == self.__machine:
-            return 3
-
-        # if no solution has been found, 2 Tie
-        return 2
-
-    def _check_main_diagonal(self, player_token):
-        # Aux variable to count till 3. When it was a value of 3 the player will have won
-        _counter = 0
-        for i in range(0, len(self.board)):
-            for j in range(0, len(self.board[0])):
-                if i - j == 0 and self.board[i][j] == player_token:
-                    _counter += 1
-        # once the board has been looped over, check the value of the counter
-        if _counter == 3:
-            return True, player_token
-        return False, None
-
-    def _check_secondary_diagonal(self, player_token):
-        # Aux variable to count till 3. When it was a value of 3 the player will have won
-        _counter = 0
-        for i in range(0, len(self.board)):
-            for j in range(0, len(self.board[0])):
-                if i + j == 2 and self.board[i][j] == player_token:
-                    _counter += 1
-        # once the board has been looped over, check the value of the counter
-        if _counter == 3:
-            return True, player_token
-        return False, None
-
-    def _check_rows(self, player_token):
-        # Aux variable to count till 3. When it was a value of 3 the player will have won
-        _counter = 0
-        for i in range(0, len(self.board)):
-            for j in range(0, len(self.board[0])):
-                if self.board[i][j] == player_token:
-                    _counter += 1
-            if _counter == 3:
-                return True, player_token
-            _counter = 0
-        return False, None
-
-    def _check_cols(self, player_token):
-        # Aux variable to count till 3. When it was a value of 3 the player will have won
-        _counter = 0
-        for i in range(0, len(self.board)):
-            for j in range(0, len(self.board[0])):
-                if self.board[j][i] == player_token:
-                    _counter += 1
-            if _counter == 3:
-                return True, player_token
-            _counter = 0
-        return False, None
+    def heuristic_evaluation(self):
+        """ It scores a non ending state within the open interval (1, 3). """
+        return self.__geometry.heuristic(self.__machine_mask, self.__human_mask)
 
 
 def check_board_position(state, board_row_position, board_col_position):
@@ -236,135 +781,193 @@ def check_board_position(state, board_row_position, board_col_position):
        :param board_row_position: from the current board
        :param board_col_position: from the current board
         It checks whether the position is available to place a token. """
-    return True if state.board[board_row_position][board_col_position] == '_' else False
+    return not state.occupied_mask & 1 << (board_row_position * state.geometry.cols + board_col_position)
 
 
 def check_board_cells(state):
-    for i in range(0, len(state.board)):
-        for j in range(0, len(state.board[0])):
-            if state.board[i][j] == '_':
-                return False
-    return True
+    return state.occupied_mask == state.geometry.full_board
 
 
 def get_coordinates(parent, optimal_movement):
-    for i in range(0, len(parent.board)):
-        for j in range(0, len(parent.board[0])):
-            if parent.board[i][j] != optimal_movement.board[i][j]:
-                return i, j
+    changed = parent.occupied_mask ^ optimal_movement.occupied_mask
+    if changed:
+        return divmod(changed.bit_length() - 1, parent.geometry.cols)
 
 
 def depth(state):
     """ it figures out the current depth"""
-    current_depth = 0
-    for i in range(0, len(state.board)):
-        for j in range(0, len(state.board[0])):
-            if state.board[i][j] == '_':
-                current_depth += 1
-    return current_depth
+    return state.geometry.cells - bin(state.occupied_mask).count('1')
 
 
-def get_direct_children(parent_state, possible_child_states):
+def search_root(root, depth, table=None, deadline=None, ordering=None, stats=None, cancel=None):
     """
-    :param parent_state: state from which we want to get the children.
-    :param possible_child_states: list of all the states generated by the minmax algorithm
-    return: a list that contains all the father's children.
+    The root is always expanded, even though the transposition table may already know its value, since the
+    best movement is kept while its children are searched. Only a strictly better child replaces the best one,
+    thus the first optimal movement is returned.
+    :return: the tuple (best value, best child, completed). If the deadline is reached or the search is
+        cancelled, completed is False and the best child among the ones searched so far is returned.
     """
-
-    direct_children = []
-    for child in possible_child_states:
-        count = 0
-        for i in range(0, len(parent_state.board)):
-            for j in range(0, len(parent_state.board[0])):
-                if parent_state.board[i][j] != child.board[i][j]:
-                    count += 1
-                if count > 1:
-                    # it means more than 1 token has been placed. Thus it's not a direct state.
-                    break
-        if count < 2:
-            # only one token has been placed. It can be appended.
-            direct_children.append(child)
-
-    return direct_children
-
-
-# Due to the failure of the deepcopy, which copies recursively and therefore,
-# in certain states it does raise a error due to infinite loops if dynamically
-# the children get appended into its parent.
-# This failure has arisen due to the use of the generators in order to get the children
-# on demand instead of generating all of them at a time with the aim to save memory. This
-# approach is used because of the deep cutoffs performed by the MinMax Algorithm with Alpha-Beta
-# pruning.
-# An alternative of copying only the states generated (not every state has been generated)
-# within a single list is the best alternative I've found.
-# Afterwards, a search in the list is performed in order to get all the direct children
-# of the root node (the current state where the machine has to place the token)
-#
-all_states_generated = []
+    best_value = -1000
+    best_child = None
+    if stats is not None:
+        stats.root_depth = depth
+        stats.nodes += 1
+    hash_move = None
+    if table is not None and ordering is not None and ordering.enabled:
+        # the first iteration has no best movement yet, the one a previous search stored is tried first.
+        hash_move = table.best_move(root.geometry.key(root.machine_mask, root.human_mask, root.machine_turn))
+    moves = None if ordering is None else ordering.ordered_moves(root, depth, hash_move)
+    for child in root.generate_children(moves):
+        try:
+            child_value = min_value_a_b(child, depth - 1, best_value, 1000, table, deadline, ordering, stats,
+                                        cancel)
+        except SearchTimeout:
+            return best_value, best_child, False
+        if child_value > best_value:
+            best_value = child_value
+            best_child = child
+    return best_value, best_child, True
+
+
+def iterative_deepening(root, max_depth, table=None, deadline=None, ordering=None, stats=None, cancel=None):
+    """
+    It searches the root one move deeper each time, up to max_depth, until the deadline is reached or the
+    search is cancelled.
+    :param ordering: MoveOrdering shared by all the iterations, it also counts the nodes of each one.
+    :return: the tuple (best value, best child) of the deepest iteration completed. If not even the first one
+        could be completed, the best child found so far.
+    """
+    best_value = None
+    best_child = None
+    for current_depth in range(1, max_depth + 1):
+        if ordering is not None:
+            ordering.start_iteration(current_depth)
+        value, child, completed = search_root(root, current_depth, table, deadline, ordering, stats, cancel)
+        if completed or best_child is None:
+            # even an unfinished first iteration is better than no movement at all.
+            best_value = value
+            best_child = child
+        if not completed:
+            break
+        if ordering is not None:
+            ordering.end_iteration()
+            # the next iteration starts with the best movement of this one.
+            ordering.best_move = best_child.occupied_mask ^ root.occupied_mask
+    return best_value, best_child
 
 
 # ALPHA-BETA-PRUNING ALGORITHM
-def max_value_a_b(state, depth, alpha, beta):
+def max_value_a_b(state, depth, alpha, beta, table=None, deadline=None, ordering=None, stats=None,
+                  cancel=None):
     if state.ending_state() or depth == 0:
+        if stats is not None:
+            stats.leaf(stats.root_depth - depth)
         # perform the static evaluation
         state.value = state.static_evaluation()
         return state.value
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout()
+    if cancel is not None and cancel.is_set():
+        raise SearchTimeout()
+    if ordering is not None:
+        ordering.nodes += 1
+    if stats is not None:
+        stats.nodes += 1
+    hash_move = None
+    if table is not None:
+        # the position, or any of its symmetric ones, may have been searched already.
+        key = state.geometry.key(state.machine_mask, state.human_mask, state.machine_turn)
+        entry = lookup(table, key, depth, alpha, beta)
+        if entry is not None:
+            if stats is not None:
+                stats.table_hits += 1
+            if entry[1] == EXACT:
+                state.value = entry[0]
+            return entry[0]
+        alpha_orig = alpha
+        if ordering is not None and ordering.enabled:
+            # the entry may be too shallow to answer, its best movement is still the one worth trying first.
+            hash_move = table.best_move(key)
     v = -1000
+    best_move = None
     # generate the following states using a generator in order to
-    # get the successors on demand.
-    for child in state.generate_children():
-        # store the new child in an independent list in order to be able to access it afterwards
-        # It's needed in order to get the best option after creating the tree.
-        all_states_generated.append(child)
-        v = max(v, min_value_a_b(child, depth - 1, alpha, beta))
-        alpha = max(alpha, v)
+    # get the successors on demand. Nothing is kept once they have been searched.
+    moves = None if ordering is None else ordering.ordered_moves(state, depth, hash_move)
+    for child in state.generate_children(moves):
+        child_value = min_value_a_b(child, depth - 1, alpha, beta, table, deadline, ordering, stats, cancel)
+        if child_value > v:
+            v = child_value
+            best_move = child.occupied_mask ^ state.occupied_mask
+        if v > alpha:
+            alpha = v
         # performs the cutoff if necessary
         if alpha >= beta:
+            if ordering is not None:
+                ordering.cutoff(state, best_move, depth)
+            if stats is not None:
+                stats.beta_cutoffs += 1
+            if table is not None:
+                store_result(table, key, alpha, alpha_orig, beta, depth, best_move)
             return alpha
     state.value = v
+    if table is not None:
+        store_result(table, key, v, alpha_orig, beta, depth, best_move)
     return v
 
 
-def min_value_a_b(state, depth, alpha, beta):
+def min_value_a_b(state, depth, alpha, beta, table=None, deadline=None, ordering=None, stats=None,
+                  cancel=None):
     if state.ending_state() or depth == 0:
+        if stats is not None:
+            stats.leaf(stats.root_depth - depth)
         # perform the static evaluation
         state.value = state.static_evaluation()
         return state.value
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout()
+    if cancel is not None and cancel.is_set():
+        raise SearchTimeout()
+    if ordering is not None:
+        ordering.nodes += 1
+    if stats is not None:
+        stats.nodes += 1
+    hash_move = None
+    if table is not None:
+        # the position, or any of its symmetric ones, may have been searched already.
+        key = state.geometry.key(state.machine_mask, state.human_mask, state.machine_turn)
+        entry = lookup(table, key, depth, alpha, beta)
+        if entry is not None:
+            if stats is not None:
+                stats.table_hits += 1
+            if entry[1] == EXACT:
+                state.value = entry[0]
+            return entry[0]
+        beta_orig = beta
+        if ordering is not None and ordering.enabled:
+            # the entry may be too shallow to answer, its best movement is still the one worth trying first.
+            hash_move = table.best_move(key)
     v = 1000
+    best_move = None
     # generate the following states using a generator in order to
-    # get the successors on demand.
-    for child in state.generate_children():
-        # store the new child in an independent list in order to be able to access it afterwards
-        # It's needed in order to get the best option after creating the tree.
-        all_states_generated.append(child)
-        v = min(v, max_value_a_b(child, depth - 1, alpha, beta))
-        beta = min(beta, v)
+    # get the successors on demand. Nothing is kept once they have been searched.
+    moves = None if ordering is None else ordering.ordered_moves(state, depth, hash_move)
+    for child in state.generate_children(moves):
+        child_value = max_value_a_b(child, depth - 1, alpha, beta, table, deadline, ordering, stats, cancel)
+        if child_value < v:
+            v = child_value
+            best_move = child.occupied_mask ^ state.occupied_mask
+        if v < beta:
+            beta = v
         # performs the cutoff if necessary
         if alpha >= beta:
+            if ordering is not None:
+                ordering.cutoff(state, best_move, depth)
+            if stats is not None:
+                stats.alpha_cutoffs += 1
+            if table is not None:
+                store_result(table, key, beta, alpha, beta_orig, depth, best_move)
             return beta
     state.value = v
+    if table is not None:
+        store_result(table, key, v, alpha, beta_orig, depth, best_move)
     return v
-
-
-source_board = [['o', '_', 'x'],
-                ['x', 'o', 'o'],
-                ['_', 'x', '_']]
-
-source_board1 = [['o', '_', 'x'],
-                 ['x', 'o', '_'],
-                 ['o', '_', 'x']]
-
-source_board2 = [['_', '_', '_'],
-                 ['_', '_', '_'],
-                 ['_', '_', '_']]
-
-source_board3 = [['o', 'o', 'x'],
-                 ['_', 'x', '_'],
-                 ['_', '_', '_']]
-
-# if the board is full of tokens, the optimal move it gets is None
-# machine token --> o
-# player token --> x
-player = MachinePlayer(source_board2, 'o', 'x')
-obj = player.get_optimal_move()
-print(obj)
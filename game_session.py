@@ -0,0 +1,121 @@
+"""
+    *
+    *   Game session: one machine player kept for a whole game, so the search of each movement reuses what the
+    *   previous ones found instead of starting cold.
+    *
+    *   The session owns the board, the machine player searching on it and a transposition table of its own.
+    *   Once the human and the machine have moved, the root advances along the movements played:
+    *       --> alpha-beta: the table entries of the subtree below the new position are still valid. The ones
+    *           too shallow to answer the deeper probes still hold the best movement, which is searched first.
+    *           The history heuristic of the move ordering is kept, halved so the latest cutoffs weigh more.
+    *       --> MCTS: the node of the new position becomes the root of the tree, along with its playouts, so
+    *           only the playouts it lacks are played.
+    *   Once the search reaches the end of the game, the later movements are mostly answered by the table and
+    *   cost a fraction of the first one. A depth limited search looks two plies beyond the previous one, which
+    *   only covered the top of the new tree, thus it mainly gains the move ordering.
+    *
+    *   Usage:
+    *       session = GameSession('o', 'x', rows=5, cols=5, win_length=4, max_depth=4)
+    *       session.play(2, 2)
+    *       i, j = session.machine_move()
+    *
+"""
+import time
+
+from enhanced_machine_player import MachinePlayer
+from transposition_table import TranspositionTable
+from win_detection import check_board
+
+
+class GameSession:
+    def __init__(self, machine_token='o', human_token='x', rows=3, cols=3, win_length=3, machine_first=False,
+                 table=None, **options):
+        """ :param machine_first: whether the machine makes the first movement.
+            :param table: transposition table of the session. A new one is created if it's None, so the entries
+                of other games do not take its room.
+            :param options: any other argument of enhanced_machine_player.MachinePlayer: max_depth, time_limit,
+                backend, playouts, seed...
+        """
+        self.__machine = machine_token
+        self.__human = human_token
+        self.__win_length = win_length
+        self.__board = [['_' for _ in range(0, cols)] for _ in range(0, rows)]
+        self.__table = TranspositionTable() if table is None else table
+        # the player keeps the board list, which is updated in place as the game goes on.
+        self.__player = MachinePlayer(self.__board, machine_token, human_token, table=self.__table,
+                                      win_length=win_length, **options)
+        self.__machine_turn = machine_first
+        self.__moves = []
+        self.__latencies = []
+
+    @property
+    def board(self):
+        """ A copy of the board, changing it does not change the game. """
+        return [list(row) for row in self.__board]
+
+    @property
+    def machine_turn(self):
+        return self.__machine_turn
+
+    @property
+    def moves(self):
+        """ The (i, j) coordinates of the movements played, in order. """
+        return list(self.__moves)
+
+    @property
+    def latencies(self):
+        """ The seconds each movement of the machine took, in order. """
+        return list(self.__latencies)
+
+    @property
+    def transposition_table(self):
+        return self.__table
+
+    @property
+    def game_over(self):
+        return check_board(self.__board, (self.__machine, self.__human), self.__win_length)[0]
+
+    @property
+    def winner(self):
+        """ The token of the player who has won, or None. """
+        return check_board(self.__board, (self.__machine, self.__human), self.__win_length)[1]
+
+    def play(self, i, j):
+        """
+        It places the human token.
+        :raise ValueError: if it's not the human's turn, the game is over or the cell is not empty.
+        """
+        if self.__machine_turn:
+            raise ValueError("it's the machine's turn")
+        self.__place(i, j, self.__human)
+
+    def machine_move(self, time_limit=None, deadline=None, cancel=None):
+        """
+        It searches the machine movement, with the same limits as MachinePlayer.get_optimal_move, and places it.
+        :return: the (i, j) coordinates of the movement.
+        :raise ValueError: if it's not the machine's turn or the game is over.
+        """
+        if not self.__machine_turn:
+            raise ValueError("it's the human's turn")
+        if self.game_over:
+            raise ValueError('the game is over')
+        start = time.perf_counter()
+        move = self.__player.get_optimal_move(time_limit, deadline, cancel)
+        self.__latencies.append(time.perf_counter() - start)
+        self.__place(move[0], move[1], self.__machine)
+        return move
+
+    def close(self):
+        """ It shuts down the processes of the player, if it has any workers. """
+        self.__player.close()
+
+    def __place(self, i, j, token):
+        if self.game_over:
+            raise ValueError('the game is over')
+        if not (0 <= i < len(self.__board) and 0 <= j < len(self.__board[0])):
+            raise ValueError(f'({i}, {j}) is out of the board')
+        if self.__board[i][j] != '_':
+            raise ValueError(f'({i}, {j}) is not empty')
+        self.__board[i][j] = token
+        self.__moves.append((i, j))
+        self.__machine_turn = not self.__machine_turn
@@ -0,0 +1,105 @@
+"""
+    *
+    *   Match making of the server: the connections are paired into game rooms, so one server hosts many
+    *   independent games at once.
+    *
+    *   The clients join the open room in the order they connect. Once it's full, it's closed to newcomers and
+    *   the next client opens a new one. Every message of a player is only sent to the players of its room,
+    *   itself included since the clients take the turn from their own echo. Thus, a movement costs as many
+    *   sends as players in the room, however many clients are connected.
+    *
+    *   A room is dropped once its last player leaves. A player who leaves does not make room for a newcomer:
+    *   the game it was playing is over.
+    *
+"""
+import itertools
+
+# players of a tic tac toe game.
+ROOM_SIZE = 2
+
+
+class Room:
+    __slots__ = ('number', 'capacity', 'players', 'log')
+
+    def __init__(self, number, capacity=ROOM_SIZE):
+        """ :param number: it tells the room apart from the other ones of the server.
+            :param capacity: players of the game.
+        """
+        self.number = number
+        self.capacity = capacity
+        # the connections of the players, in the order they joined.
+        self.players = []
+        # the MoveLog of the game, set by the server.
+        self.log = None
+
+    @property
+    def full(self):
+        return len(self.players) >= self.capacity
+
+    def __repr__(self):
+        return f'Room({self.number}, {len(self.players)}/{self.capacity} players)'
+
+
+class Matchmaker:
+    def __init__(self, room_size=ROOM_SIZE):
+        """ :param room_size: players of every room. """
+        if room_size < 1:
+            raise ValueError('room_size must be a positive number')
+        self.__room_size = room_size
+        self.__numbers = itertools.count(1)
+        # number --> Room, the ones with any player.
+        self.__rooms = {}
+        # the room newcomers join, None until the next one connects.
+        self.__open_room = None
+
+    @property
+    def rooms(self):
+        """ The rooms with any player. """
+        return list(self.__rooms.values())
+
+    @property
+    def room_size(self):
+        return self.__room_size
+
+    def room(self, number):
+        return self.__rooms.get(number)
+
+    def join(self, player):
+        """
+        It puts the player into the open room, opening a new one if there is none.
+        :param player: the connection of the player. Its room and seat attributes are set: the room and
+            the order the player joined it in, starting with 0.
+        :return: the room.
+        """
+        room = self.__open_room
+        if room is None:
+            room = Room(next(self.__numbers), self.__room_size)
+            self.__rooms[room.number] = room
+            self.__open_room = room
+        player.room = room
+        player.seat = len(room.players)
+        room.players.append(player)
+        if room.full:
+            # it's not opened to newcomers again.
+            self.__open_room = None
+        return room
+
+    def leave(self, player):
+        """
+        It takes the player out of its room, dropping the room once it's empty.
+        :return: the room the player was in, None if it was in none.
+        """
+        room = player.room
+        if room is None:
+            return None
+        player.room = None
+        room.players.remove(player)
+        if not room.players:
+            self.__rooms.pop(room.number, None)
+            if room is self.__open_room:
+                self.__open_room = None
+        return room
+
+    def peers(self, player):
+        """ The players who receive the messages of the player: the ones of its room, itself included. """
+        return () if player.room is None else player.room.players
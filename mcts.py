@@ -0,0 +1,310 @@
+"""
+    *
+    *   Monte Carlo Tree Search backend of the enhanced machine player.
+    *
+    *   Instead of evaluating the positions, the tree grows towards the most promising movements by playing
+    *   random games (playouts) from them. Each iteration:
+    *       --> selection: from the root, the child with the best UCT score is followed while the node has been
+    *           fully expanded. UCT = wins / visits + exploration * sqrt(ln(parent visits) / visits).
+    *       --> expansion: one untried movement of the node reached becomes a new child. If the side to move can
+    *           win at once, that movement is the only one tried; otherwise, if the opponent could, only the
+    *           movements blocking it are (decisive and anti-decisive moves).
+    *       --> simulation: a random game is played from the child over both players' bitmasks. Only the lines
+    *           which go through each placed token are checked for a win.
+    *       --> backpropagation: every node on the path adds the visit and the result, seen from the player who
+    *           made the movement leading to it: 1 win, 0.5 tie, 0 loss.
+    *   The movement returned is the most visited child of the root, the first one in row-major order on ties.
+    *
+    *   The tree may be kept between the movements of a game: once both players have moved, the node of the new
+    *   position becomes the root, along with the playouts it already holds.
+    *
+    *   With a process pool, the playouts are split into batches, one per process. Each process grows its own
+    *   tree with its own seed and the visits and wins of the root children are added up (root parallelism).
+    *
+    *   Usage: python mcts.py [--seed 0] [--games 20] [--playouts 2000]
+    *
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+# Weight of the exploration term of the UCT score.
+UCT_EXPLORATION = math.sqrt(2)
+# Playouts of a search when neither a deadline nor a cancellation is given.
+DEFAULT_PLAYOUTS = 2000
+# Playouts between two checks of the deadline and the cancellation token.
+CHECK_INTERVAL = 32
+
+
+class MCTSNode:
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'wins', 'machine_turn', 'result')
+
+    def __init__(self, move, parent, machine_turn, untried, result=None):
+        """ :param move: cell, i * cols + j, of the token placed to reach the node.
+            :param machine_turn: whether the machine is the one to move.
+            :param untried: cells not expanded yet.
+            :param result: the result for the machine (1, 0.5 or 0) if the game is over, otherwise None.
+        """
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        self.machine_turn = machine_turn
+        self.result = result
+
+
+class MonteCarloSearch:
+    def __init__(self, geometry, seed=None, exploration=UCT_EXPLORATION):
+        """ :param geometry: shape of the board, the Geometry of the enhanced machine player.
+            :param seed: seed of the random playouts, so a search may be reproduced.
+        """
+        self.geometry = geometry
+        self.random = random.Random(seed)
+        self.exploration = exploration
+        self.playouts = 0
+        self.nodes = 0
+        self.root = None
+
+    def search(self, machine_mask, human_mask, playouts=DEFAULT_PLAYOUTS, deadline=None, cancel=None, root=None):
+        """
+        The machine is the one to move.
+        :param playouts: the most playouts the root holds once the search is over, None for as many as the
+            deadline or the cancellation allow.
+        :param root: node of the position kept from a previous search, see descend_tree. A new tree is grown
+            if it's None.
+        :return: a dictionary cell --> (visits, wins) with the children of the root, the wins being the ones of
+            the machine.
+        """
+        if playouts is None and deadline is None and cancel is None:
+            playouts = DEFAULT_PLAYOUTS
+        if root is None:
+            root = self.__new_node(None, None, machine_mask, human_mask, True)
+        self.root = root
+        if playouts is not None:
+            playouts -= root.visits
+        done = 0
+        while playouts is None or done < playouts:
+            if done % CHECK_INTERVAL == 0 and done:
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+                if cancel is not None and cancel.is_set():
+                    break
+            self.__iterate(root, machine_mask, human_mask)
+            done += 1
+        self.playouts += done
+        return {child.move: (child.visits, child.wins) for child in root.children}
+
+    def __new_node(self, move, parent, machine_mask, human_mask, machine_turn):
+        geometry = self.geometry
+        self.nodes += 1
+        if parent is not None and geometry.is_win(human_mask if machine_turn else machine_mask):
+            # the movement which led to the node has won the game.
+            return MCTSNode(move, parent, machine_turn, [], 0.0 if machine_turn else 1.0)
+        occupied = machine_mask | human_mask
+        if occupied == geometry.full_board:
+            return MCTSNode(move, parent, machine_turn, [], 0.5)
+        untried = [cell for cell, bit in enumerate(geometry.cell_bits) if not occupied & bit]
+        own, opponent = (machine_mask, human_mask) if machine_turn else (human_mask, machine_mask)
+        winning = self.__winning_cells(own, untried)
+        if winning:
+            untried = winning[:1]
+        else:
+            # the threats of the opponent must be blocked
+            untried = self.__winning_cells(opponent, untried) or untried
+        # the movements are expanded in a random order
+        self.random.shuffle(untried)
+        return MCTSNode(move, parent, machine_turn, untried)
+
+    def __winning_cells(self, mask, cells):
+        """ The cells which would make the player win at once. """
+        cell_lines = self.geometry.cell_lines
+        winning = []
+        for cell in cells:
+            placed = mask | 1 << cell
+            for line in cell_lines[cell]:
+                if placed & line == line:
+                    winning.append(cell)
+                    break
+        return winning
+
+    def __iterate(self, root, machine_mask, human_mask):
+        node = root
+        exploration = self.exploration
+        # selection
+        while not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            best = None
+            best_score = -1.0
+            for child in node.children:
+                score = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+                if score > best_score:
+                    best = child
+                    best_score = score
+            if node.machine_turn:
+                machine_mask |= 1 << best.move
+            else:
+                human_mask |= 1 << best.move
+            node = best
+        # expansion
+        if node.untried:
+            cell = node.untried.pop()
+            if node.machine_turn:
+                machine_mask |= 1 << cell
+            else:
+                human_mask |= 1 << cell
+            child = self.__new_node(cell, node, machine_mask, human_mask, not node.machine_turn)
+            node.children.append(child)
+            node = child
+        # simulation
+        result = node.result
+        if result is None:
+            result = self.playout(machine_mask, human_mask, node.machine_turn)
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            # the wins are the ones of the player who made the movement leading to the node.
+            node.wins += 1.0 - result if node.machine_turn else result
+            node = node.parent
+
+    def playout(self, machine_mask, human_mask, machine_turn):
+        """ It plays a random game and returns the result for the machine: 1 win, 0.5 tie, 0 loss. """
+        cell_lines = self.geometry.cell_lines
+        occupied = machine_mask | human_mask
+        empty = [cell for cell, bit in enumerate(self.geometry.cell_bits) if not occupied & bit]
+        self.random.shuffle(empty)
+        for cell in empty:
+            if machine_turn:
+                machine_mask |= 1 << cell
+                for line in cell_lines[cell]:
+                    if machine_mask & line == line:
+                        return 1.0
+            else:
+                human_mask |= 1 << cell
+                for line in cell_lines[cell]:
+                    if human_mask & line == line:
+                        return 0.0
+            machine_turn = not machine_turn
+        return 0.5
+
+
+def descend_tree(root, machine_mask, human_mask, new_machine_mask, new_human_mask):
+    """
+    It follows the movements played since the tree was grown, the machine being the one to move both at the
+    root and at the new position.
+    :return: the node of the new position, detached from its parent, or None if the position cannot be reached
+        from the root or its node has not been expanded.
+    """
+    if machine_mask & ~new_machine_mask or human_mask & ~new_human_mask:
+        return None
+    added = (new_machine_mask & ~machine_mask, new_human_mask & ~human_mask)
+    if bin(added[0]).count('1') != bin(added[1]).count('1'):
+        return None
+    remaining = [added[0], added[1]]
+    node = root
+    while remaining[0] or remaining[1]:
+        side = 0 if node.machine_turn else 1
+        for child in node.children:
+            if remaining[side] >> child.move & 1:
+                # any order of the movements leads to the same position.
+                remaining[side] &= ~(1 << child.move)
+                node = child
+                break
+        else:
+            return None
+    if node is root:
+        return root
+    node.parent = None
+    return node
+
+
+def merge_root_children(results):
+    """ It adds up the cell --> (visits, wins) dictionaries of several searches. """
+    merged = {}
+    for result in results:
+        for cell, (visits, wins) in result.items():
+            previous_visits, previous_wins = merged.get(cell, (0, 0.0))
+            merged[cell] = previous_visits + visits, previous_wins + wins
+    return merged
+
+
+def best_root_child(children):
+    """
+    :return: the tuple (cell, value) of the most visited child, the first one in row-major order on ties. The
+        value is the mean result scaled to the one of the static evaluation: 1 loss, 2 tie, 3 win.
+    """
+    best_cell = None
+    best_visits = -1
+    for cell in sorted(children):
+        visits = children[cell][0]
+        if visits > best_visits:
+            best_cell = cell
+            best_visits = visits
+    if best_cell is None:
+        return None, None
+    visits, wins = children[best_cell]
+    return best_cell, 1 + 2 * wins / visits
+
+
+def benchmark(seed=0, games=20, playouts=DEFAULT_PLAYOUTS, boards=((3, 3, 3), (5, 5, 4), (7, 6, 4)),
+              alpha_beta_depth=3):
+    """
+    It reports the playouts per second of a search from the empty board, and the result of games between the
+    MCTS backend and the alpha-beta one, each of them playing first half of the games.
+    :return: a list with a dictionary for each board.
+    """
+    from enhanced_machine_player import MachinePlayer, get_geometry
+    report = []
+    for rows, cols, win_length in boards:
+        search = MonteCarloSearch(get_geometry(rows, cols, win_length), seed)
+        start = time.perf_counter()
+        search.search(0, 0, playouts)
+        playouts_per_second = search.playouts / (time.perf_counter() - start)
+
+        results = {'win': 0, 'tie': 0, 'loss': 0}
+        for game in range(0, games):
+            board = [['_' for _ in range(0, cols)] for _ in range(0, rows)]
+            # 'm' is the MCTS backend and 'a' the alpha-beta one.
+            players = {
+                'm': MachinePlayer(board, 'm', 'a', win_length=win_length, backend='mcts', playouts=playouts,
+                                   seed=seed * games + game),
+                'a': MachinePlayer(board, 'a', 'm', win_length=win_length, max_depth=alpha_beta_depth),
+            }
+            turn = 'm' if game % 2 == 0 else 'a'
+            while True:
+                move = players[turn].get_optimal_move()
+                if move is None:
+                    break
+                board[move[0]][move[1]] = turn
+                turn = 'a' if turn == 'm' else 'm'
+            winner = _winner(board, win_length)
+            results['win' if winner == 'm' else 'loss' if winner == 'a' else 'tie'] += 1
+        report.append({'board': f'{rows}x{cols} k={win_length}', 'playouts_per_second': playouts_per_second,
+                       'games': games, **results})
+    return report
+
+
+def _winner(board, win_length):
+    from win_detection import check_board
+    return check_board(board, ('m', 'a'), win_length)[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seeded benchmark of the MCTS backend.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--playouts', type=int, default=DEFAULT_PLAYOUTS)
+    parser.add_argument('--depth', type=int, default=3, help='depth of the alpha-beta opponent')
+    args = parser.parse_args(argv)
+    print(f'{"board":<12} {"playouts/s":>10} {"games":>6} {"mcts wins":>9} {"ties":>5} {"losses":>6}')
+    for row in benchmark(args.seed, args.games, args.playouts, alpha_beta_depth=args.depth):
+        print(f'{row["board"]:<12} {row["playouts_per_second"]:>10.0f} {row["games"]:>6} {row["win"]:>9} '
+              f'{row["tie"]:>5} {row["loss"]:>6}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
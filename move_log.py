@@ -0,0 +1,170 @@
+"""
+    *
+    *   Move log of the server: every game room keeps the messages of its players.
+    *
+    *   In memory, a room only keeps its latest messages: a ring buffer of capacity entries, where appending
+    *   takes constant time and the oldest entry is dropped once it's full. Thus, a long-running server does
+    *   not grow with the games it has hosted.
+    *
+    *   Optionally, every message is appended to a log file shared by all the rooms. The records are buffered
+    *   and written flush_size bytes at a time. Each record is:
+    *       --> game number (4 bytes, big endian) and seat of the player in the room (1 byte).
+    *       --> the message as the frame of protocol: payload length, message type and payload.
+    *   So a movement takes 9 bytes. The file is read back one record at a time by read_log, without loading
+    *   it whole.
+    *
+    *   The game numbers start at 1 on every start of the server, while the file is appended across them. Thus
+    *   every writer begins with a run record: game RUN_GAME (0, no room has it) and a TEXT frame holding the
+    *   identifier of the run, its start time and a random suffix. A game is told apart by the pair (run, game).
+    *
+    *   Usage: python move_log.py moves.log [--run 20261018T180330-1a2b3c4d] [--game 3]
+    *
+"""
+import argparse
+import struct
+import sys
+import time
+import uuid
+from collections import deque
+
+from protocol import HEADER, HEADER_SIZE, TEXT, describe, encode_frame
+
+# game number, seat
+RECORD = struct.Struct('!IB')
+# messages a room keeps in memory, a 3 x 3 game takes 9 movements at most.
+DEFAULT_CAPACITY = 64
+# bytes buffered before they are written to the file.
+FLUSH_SIZE = 64 * 1024
+# game number of the run records, the rooms are numbered from 1.
+RUN_GAME = 0
+
+
+def new_run_id():
+    """ The start time of the run, in UTC, and a random suffix, so two runs started at once differ. """
+    return time.strftime('%Y%m%dT%H%M%S', time.gmtime()) + '-' + uuid.uuid4().hex[:8]
+
+
+class LogWriter:
+    def __init__(self, path, flush_size=FLUSH_SIZE, run=None):
+        """ :param path: file the records are appended to.
+            :param flush_size: bytes kept in memory before they are written, 0 writes every record at once.
+            :param run: identifier of the run the records belong to, a new one by default.
+        """
+        self.__file = open(path, 'ab')
+        self.__flush_size = flush_size
+        self.__buffer = bytearray()
+        self.__records = 0
+        self.__run = new_run_id() if run is None else run
+        # the run record is not counted as a message.
+        self.__buffer += RECORD.pack(RUN_GAME, 0) + encode_frame(TEXT, self.__run.encode('utf-8'))
+
+    @property
+    def run(self):
+        return self.__run
+
+    @property
+    def records(self):
+        """ Records written since the file was opened, the buffered ones included. """
+        return self.__records
+
+    def write(self, game, seat, kind, payload):
+        self.__buffer += RECORD.pack(game, seat)
+        self.__buffer += encode_frame(kind, payload)
+        self.__records += 1
+        if len(self.__buffer) >= self.__flush_size:
+            self.flush()
+
+    def flush(self):
+        if self.__buffer:
+            self.__file.write(self.__buffer)
+            self.__buffer.clear()
+        self.__file.flush()
+
+    def close(self):
+        if not self.__file.closed:
+            self.flush()
+            self.__file.close()
+
+
+class MoveLog:
+    def __init__(self, game, capacity=DEFAULT_CAPACITY, writer=None):
+        """ :param game: number of the game room.
+            :param capacity: latest messages kept in memory.
+            :param writer: LogWriter every message is written to as well, None to keep them in memory only.
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be a positive number')
+        self.__game = game
+        # (seat, type, payload)
+        self.__recent = deque(maxlen=capacity)
+        self.__writer = writer
+        self.__total = 0
+
+    @property
+    def game(self):
+        return self.__game
+
+    @property
+    def total(self):
+        """ Messages appended since the game started, the ones dropped from memory included. """
+        return self.__total
+
+    @property
+    def dropped(self):
+        return self.__total - len(self.__recent)
+
+    def __len__(self):
+        return len(self.__recent)
+
+    def __iter__(self):
+        """ The latest messages, the oldest one first, as tuples (seat, type, payload). """
+        return iter(list(self.__recent))
+
+    def append(self, seat, kind, payload):
+        self.__recent.append((seat, kind, payload))
+        self.__total += 1
+        if self.__writer is not None:
+            self.__writer.write(self.__game, seat, kind, payload)
+
+
+def read_log(path, game=None, run=None):
+    """
+    A generator of the messages of a log file, in the order they were written.
+    :param game: number of the only game whose messages are yielded, None for all of them.
+    :param run: identifier of the only run whose messages are yielded, None for all of them.
+    :return: tuples (run, game, seat, type, payload). The run is None for the messages written before any
+        run record.
+    :raise ValueError: if the file ends in the middle of a record.
+    """
+    current_run = None
+    with open(path, 'rb') as file:
+        while True:
+            header = file.read(RECORD.size + HEADER_SIZE)
+            if not header:
+                return
+            if len(header) < RECORD.size + HEADER_SIZE:
+                raise ValueError(f'{path} ends in the middle of a record')
+            record_game, seat = RECORD.unpack_from(header)
+            length, kind = HEADER.unpack_from(header, RECORD.size)
+            payload = file.read(length)
+            if len(payload) < length:
+                raise ValueError(f'{path} ends in the middle of a record')
+            if record_game == RUN_GAME:
+                current_run = payload.decode('utf-8', errors='replace')
+            elif (game is None or record_game == game) and (run is None or current_run == run):
+                yield current_run, record_game, seat, kind, payload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='It prints the records of a move log file.')
+    parser.add_argument('path')
+    parser.add_argument('--run', help='identifier of the only run printed')
+    parser.add_argument('--game', type=int, help='number of the only game printed, within every run printed')
+    args = parser.parse_args(argv)
+    for run, game, seat, kind, payload in read_log(args.path, args.game, args.run):
+        print(f'{run}\t{game}\t{seat}\t{describe(kind, payload)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
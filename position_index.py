@@ -0,0 +1,264 @@
+"""
+    *
+    *   Position indexing: the conversions between the ways a board is handled, so they are written once.
+    *       --> nested list board: rows of tokens, '_' being an empty cell. The one the GUI and the players get.
+    *       --> bitboard pair: one integer mask per player, the bit i * cols + j set whenever the player has its
+    *           token placed in the cell (i, j). The one the search works with.
+    *       --> base 3 index: the board as a number written in base 3, the cell (i, j) being the digit
+    *           i * cols + j: 0 empty, 1 the first player (the machine), 2 the second one (the human).
+    *
+    *   The base 3 index is a perfect hash of the boards of a given shape: every board gets its own index, and
+    *   all of them fall within range(0, 3 ** (rows * cols)), thus it can address a flat array such as the
+    *   tablebase. The canonical index is the smallest index among the symmetric boards: the 8 rotations and
+    *   reflections of a square board, or the 4 flips of any other one, so the boards worth the same share it.
+    *
+    *   The batch functions take NumPy arrays if NumPy is installed, and lists otherwise. NumPy is only imported
+    *   once an array is given, so importing the players doesn't pay for it.
+    *
+"""
+from functools import lru_cache
+
+EMPTY = '_'
+
+
+def board_to_mask(board, player_token):
+    """ It returns the bitmask of the cells the player has its token placed in. """
+    mask = 0
+    cols = len(board[0])
+    for i in range(0, len(board)):
+        for j in range(0, cols):
+            if board[i][j] == player_token:
+                mask |= 1 << (i * cols + j)
+    return mask
+
+
+def board_masks(board, machine, human):
+    """ It turns a nested list board into the pair (machine_mask, human_mask), going through the cells once. """
+    machine_mask = 0
+    human_mask = 0
+    cols = len(board[0])
+    for i in range(0, len(board)):
+        row = board[i]
+        for j in range(0, cols):
+            if row[j] == machine:
+                machine_mask |= 1 << (i * cols + j)
+            elif row[j] == human:
+                human_mask |= 1 << (i * cols + j)
+    return machine_mask, human_mask
+
+
+def mask_to_board(machine_mask, human_mask, machine, human, rows=3, cols=3):
+    """ It rebuilds the nested list board out of both players' bitmasks. """
+    board = [[EMPTY for _ in range(0, cols)] for _ in range(0, rows)]
+    for cell in range(0, rows * cols):
+        if machine_mask >> cell & 1:
+            board[cell // cols][cell % cols] = machine
+        elif human_mask >> cell & 1:
+            board[cell // cols][cell % cols] = human
+    return board
+
+
+def index_count(rows=3, cols=3):
+    """ The number of indexes of the boards of the shape, 3 ** (rows * cols). """
+    return 3 ** (rows * cols)
+
+
+@lru_cache(maxsize=None)
+def ternary_table():
+    """ The base 3 weight of every 9-bit mask, the sum of 3^cell over its set bits. It's built the first time. """
+    return tuple(sum(3 ** cell for cell in range(0, 9) if mask >> cell & 1) for mask in range(0, 1 << 9))
+
+
+@lru_cache(maxsize=None)
+def _byte_ternary_table():
+    """ The base 3 weight of every 8-bit mask, so a mask of any size is converted a byte at a time. """
+    return tuple(sum(3 ** cell for cell in range(0, 8) if mask >> cell & 1) for mask in range(0, 1 << 8))
+
+
+def _ternary(mask):
+    if mask < 1 << 9:
+        return ternary_table()[mask]
+    table = _byte_ternary_table()
+    weight = 0
+    scale = 1
+    while mask:
+        weight += table[mask & 0xFF] * scale
+        mask >>= 8
+        scale *= 6561
+    return weight
+
+
+def masks_to_index(machine_mask, human_mask):
+    """ It returns the base 3 index of the board given by both players' masks. """
+    return _ternary(machine_mask) + 2 * _ternary(human_mask)
+
+
+def index_to_masks(index, rows=3, cols=3):
+    """ It returns the pair (machine_mask, human_mask) of the base 3 index. """
+    if not 0 <= index < index_count(rows, cols):
+        raise ValueError(f'{index} is not the index of a {rows} x {cols} board')
+    machine_mask = 0
+    human_mask = 0
+    cell = 0
+    while index:
+        index, digit = divmod(index, 3)
+        if digit == 1:
+            machine_mask |= 1 << cell
+        elif digit == 2:
+            human_mask |= 1 << cell
+        cell += 1
+    return machine_mask, human_mask
+
+
+def board_to_index(board, machine, human):
+    return masks_to_index(*board_masks(board, machine, human))
+
+
+def index_to_board(index, machine, human, rows=3, cols=3):
+    return mask_to_board(*index_to_masks(index, rows, cols), machine, human, rows, cols)
+
+
+@lru_cache(maxsize=None)
+def symmetry_cells(rows=3, cols=3):
+    """
+    :return: for each symmetry of the board, the cell every cell goes to. The identity is the first one. A square
+        board has the 8 rotations and reflections, any other one the identity, both flips and the half turn.
+    """
+    transforms = [lambda i, j: (i, j), lambda i, j: (i, cols - 1 - j), lambda i, j: (rows - 1 - i, j),
+                  lambda i, j: (rows - 1 - i, cols - 1 - j)]
+    if rows == cols:
+        transforms += [lambda i, j: (j, i), lambda i, j: (cols - 1 - j, i), lambda i, j: (j, rows - 1 - i),
+                       lambda i, j: (cols - 1 - j, rows - 1 - i)]
+    cells = []
+    for transform in transforms:
+        destination = []
+        for cell in range(0, rows * cols):
+            i, j = transform(cell // cols, cell % cols)
+            destination.append(i * cols + j)
+        cells.append(tuple(destination))
+    return tuple(cells)
+
+
+def transform_mask(mask, destination):
+    """ It moves every set bit of the mask to the cell the symmetry sends it to. """
+    transformed = 0
+    cell = 0
+    while mask:
+        if mask & 1:
+            transformed |= 1 << destination[cell]
+        mask >>= 1
+        cell += 1
+    return transformed
+
+
+@lru_cache(maxsize=None)
+def symmetry_tables():
+    """
+    For each symmetry of the 3 x 3 board, in the order of symmetry_cells, a table mapping every one of the 2^9
+    masks into its transformed mask. It's built the first time.
+    """
+    return tuple(tuple(transform_mask(mask, destination) for mask in range(0, 1 << 9))
+                 for destination in symmetry_cells(3, 3))
+
+
+def canonical_index(machine_mask, human_mask, rows=3, cols=3):
+    """ It returns the smallest base 3 index among the symmetric boards. """
+    if rows == 3 and cols == 3:
+        # the 3 x 3 symmetries are precomputed for every mask.
+        ternary = ternary_table()
+        return min(ternary[table[machine_mask]] + 2 * ternary[table[human_mask]] for table in symmetry_tables())
+    return min(masks_to_index(transform_mask(machine_mask, destination), transform_mask(human_mask, destination))
+               for destination in symmetry_cells(rows, cols))
+
+
+# the greatest index, 3 ** cells - 1, fits in an int64 up to 39 cells.
+MAX_BATCH_INDEX_CELLS = 39
+# the bit of every cell fits in an int64 up to 63 cells, the sign bit is left alone.
+MAX_BATCH_MASK_CELLS = 63
+
+
+def is_ndarray(value):
+    """ It tells whether the value is a NumPy array, without importing NumPy. """
+    return type(value).__name__ == 'ndarray' and type(value).__module__ == 'numpy'
+
+
+def _powers(cells):
+    import numpy
+    if cells > MAX_BATCH_INDEX_CELLS:
+        raise ValueError(f'the indexes of boards of {cells} cells do not fit in 64 bits')
+    return numpy.array([3 ** cell for cell in range(0, cells)], dtype=numpy.int64)
+
+
+def _bits(cells):
+    import numpy
+    if cells > MAX_BATCH_MASK_CELLS:
+        raise ValueError(f'the masks of boards of {cells} cells do not fit in 64 bits')
+    return numpy.left_shift(1, numpy.arange(cells, dtype=numpy.int64))
+
+
+def batch_board_masks(boards, machine, human):
+    """
+    :param boards: sequence of nested list boards, or a NumPy array shaped (boards, rows, cols).
+    :return: the pair (machine_masks, human_masks), NumPy arrays if the boards were given as one.
+    """
+    if is_ndarray(boards):
+        import numpy
+        cells = boards.shape[1] * boards.shape[2]
+        bits = _bits(cells)
+        flat = boards.reshape(boards.shape[0], cells)
+        return (flat == machine).astype(numpy.int64) @ bits, (flat == human).astype(numpy.int64) @ bits
+    machine_masks = []
+    human_masks = []
+    for board in boards:
+        machine_mask, human_mask = board_masks(board, machine, human)
+        machine_masks.append(machine_mask)
+        human_masks.append(human_mask)
+    return machine_masks, human_masks
+
+
+def batch_masks_to_index(machine_masks, human_masks, rows=3, cols=3):
+    """
+    :param machine_masks: sequence of machine masks, or a NumPy array.
+    :param human_masks: the human masks of the same boards.
+    :return: the base 3 index of every board, a NumPy array if the masks were given as one.
+    """
+    if is_ndarray(machine_masks):
+        import numpy
+        cells = rows * cols
+        powers = _powers(cells)
+        shifts = numpy.arange(cells, dtype=numpy.int64)
+        machine_digits = (numpy.asarray(machine_masks, dtype=numpy.int64)[:, None] >> shifts) & 1
+        human_digits = (numpy.asarray(human_masks, dtype=numpy.int64)[:, None] >> shifts) & 1
+        return (machine_digits + 2 * human_digits) @ powers
+    return [masks_to_index(machine_mask, human_mask) for machine_mask, human_mask in zip(machine_masks, human_masks)]
+
+
+def batch_index_to_masks(indexes, rows=3, cols=3):
+    """ :return: the pair (machine_masks, human_masks), NumPy arrays if the indexes were given as one. """
+    if is_ndarray(indexes):
+        import numpy
+        cells = rows * cols
+        digits = (numpy.asarray(indexes, dtype=numpy.int64)[:, None] // _powers(cells)) % 3
+        bits = _bits(cells)
+        return (digits == 1).astype(numpy.int64) @ bits, (digits == 2).astype(numpy.int64) @ bits
+    machine_masks = []
+    human_masks = []
+    for index in indexes:
+        machine_mask, human_mask = index_to_masks(index, rows, cols)
+        machine_masks.append(machine_mask)
+        human_masks.append(human_mask)
+    return machine_masks, human_masks
+
+
+def batch_board_to_index(boards, machine, human):
+    """
+    :param boards: sequence of nested list boards, or a NumPy array shaped (boards, rows, cols).
+    :return: the base 3 index of every board, a NumPy array if the boards were given as one.
+    """
+    if is_ndarray(boards):
+        import numpy
+        cells = boards.shape[1] * boards.shape[2]
+        flat = boards.reshape(boards.shape[0], cells)
+        digits = (flat == machine).astype(numpy.int64) + 2 * (flat == human).astype(numpy.int64)
+        return digits @ _powers(cells)
+    return [board_to_index(board, machine, human) for board in boards]
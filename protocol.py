@@ -0,0 +1,207 @@
+"""
+    *
+    *   Wire protocol shared by the server and the clients.
+    *
+    *   Every message is sent as a frame: a fixed header of HEADER_SIZE bytes followed by the payload.
+    *       --> header: the length of the payload (2 bytes, big endian) and the type of the message (1 byte).
+    *       --> MOVE payload: a single byte, the cell i * cols + j of the token placed in the low 7 bits and,
+    *           in the high bit, whether the other player is the next one to move. The same as "1-2 False".
+    *       --> DISCONNECT payload: none, the player leaves the game.
+    *       --> TEXT payload: UTF-8 text.
+    *   Thus a movement takes 4 bytes instead of the 64 bytes of padded ASCII header plus its text.
+    *
+    *   A frame whose payload does not suit its type (a MOVE not 1 byte long, a DISCONNECT with a payload, a TEXT
+    *   which is not UTF-8) is rejected by the reader as well as by the encoder, so it's never relayed.
+    *
+    *   TCP does not keep the boundaries of the writes: a read may end in the middle of a frame or hold several
+    *   of them. FrameReader buffers the bytes received and returns every complete frame, keeping the rest for
+    *   the next read.
+    *
+    *   Usage: python protocol.py --fuzz 10000
+    *
+"""
+import argparse
+import random
+import struct
+import sys
+
+# payload length, message type
+HEADER = struct.Struct('!HB')
+HEADER_SIZE = HEADER.size
+MAX_PAYLOAD = 1024
+
+MOVE = 1
+DISCONNECT = 2
+TEXT = 3
+MESSAGE_TYPES = {MOVE: 'move', DISCONNECT: 'disconnect', TEXT: 'text'}
+# type --> length of its payload, the types missing take any length up to the maximum.
+PAYLOAD_SIZES = {MOVE: 1, DISCONNECT: 0}
+# the highest cell a MOVE payload holds, along with the turn bit.
+MAX_CELL = 0x7F
+TURN_BIT = 0x80
+
+
+class ProtocolError(ValueError):
+    """ The bytes received are not a valid frame, the connection should be closed. """
+
+
+def check_payload(kind, payload):
+    """ :raise ProtocolError: if the payload does not suit the message type. """
+    size = PAYLOAD_SIZES.get(kind)
+    if size is not None and len(payload) != size:
+        raise ProtocolError(f'a {MESSAGE_TYPES[kind]} payload takes {size} bytes, not {len(payload)}')
+    if kind == TEXT:
+        try:
+            payload.decode('utf-8')
+        except UnicodeDecodeError as error:
+            raise ProtocolError(f'a text payload must be UTF-8: {error}') from None
+
+
+def encode_frame(kind, payload=b''):
+    if kind not in MESSAGE_TYPES:
+        raise ProtocolError(f'unknown message type {kind}')
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f'a payload of {len(payload)} bytes is longer than {MAX_PAYLOAD}')
+    check_payload(kind, payload)
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def encode_move(i, j, turn, cols=3):
+    """
+    :param turn: whether the other player is the next one to move, the "True" / "False" of the clients.
+    :return: the MOVE frame of the token placed in the cell (i, j).
+    """
+    cell = i * cols + j
+    if not 0 <= cell <= MAX_CELL or not 0 <= j < cols:
+        raise ProtocolError(f'({i}, {j}) cannot be encoded in a board of {cols} columns')
+    return HEADER.pack(1, MOVE) + bytes((cell | (TURN_BIT if turn else 0),))
+
+
+def decode_move(payload, cols=3):
+    """ :return: the tuple (i, j, turn) of a MOVE payload. """
+    if len(payload) != 1:
+        raise ProtocolError(f'a move payload takes 1 byte, not {len(payload)}')
+    i, j = divmod(payload[0] & MAX_CELL, cols)
+    return i, j, bool(payload[0] & TURN_BIT)
+
+
+def encode_disconnect():
+    return HEADER.pack(0, DISCONNECT)
+
+
+def encode_text(text):
+    return encode_frame(TEXT, text.encode('utf-8'))
+
+
+def describe(kind, payload, cols=3):
+    """ The message written the way the clients used to send it, for the logs. """
+    if kind == MOVE:
+        i, j, turn = decode_move(payload, cols)
+        return f'{i}-{j} {turn}'
+    if kind == DISCONNECT:
+        return 'disconnectclient'
+    return payload.decode('utf-8', errors='replace')
+
+
+class FrameReader:
+    def __init__(self, max_payload=MAX_PAYLOAD):
+        """ :param max_payload: longest payload accepted, a longer one raises ProtocolError. """
+        self.__max_payload = max_payload
+        self.__buffer = bytearray()
+
+    @property
+    def pending(self):
+        """ Bytes received which do not make up a whole frame yet. """
+        return len(self.__buffer)
+
+    def feed(self, data):
+        """
+        :param data: bytes just received, any number of them.
+        :return: the list of tuples (type, payload) of the frames completed by the data, in order.
+        :raise ProtocolError: if a header is not valid, or a payload does not suit its type. The reader cannot be
+            used any longer.
+        """
+        buffer = self.__buffer
+        buffer += data
+        frames = []
+        offset = 0
+        while len(buffer) - offset >= HEADER_SIZE:
+            length, kind = HEADER.unpack_from(buffer, offset)
+            if kind not in MESSAGE_TYPES:
+                raise ProtocolError(f'unknown message type {kind}')
+            if length > self.__max_payload:
+                raise ProtocolError(f'a payload of {length} bytes is longer than {self.__max_payload}')
+            end = offset + HEADER_SIZE + length
+            if end > len(buffer):
+                # the rest of the frame is on its way.
+                break
+            payload = bytes(buffer[offset + HEADER_SIZE:end])
+            check_payload(kind, payload)
+            frames.append((kind, payload))
+            offset = end
+        # the consumed bytes are dropped once per read, not once per frame.
+        del buffer[:offset]
+        return frames
+
+
+def fuzz(iterations=1000, seed=0):
+    """
+    It checks the framing against random streams:
+        --> valid frames split at random points, or coalesced, must be read back unchanged.
+        --> random bytes may only raise ProtocolError.
+    :return: the number of frames read back.
+    :raise AssertionError: if a check fails.
+    """
+    rng = random.Random(seed)
+    frames_read = 0
+    for _ in range(0, iterations):
+        sent = []
+        for _ in range(0, rng.randint(0, 20)):
+            kind = rng.choice((MOVE, DISCONNECT, TEXT))
+            if kind == MOVE:
+                payload = encode_move(rng.randrange(0, 3), rng.randrange(0, 3), rng.random() < 0.5)[HEADER_SIZE:]
+            elif kind == DISCONNECT:
+                payload = b''
+            else:
+                # characters below U+0800 take 2 bytes at most.
+                length = rng.choice((0, 1, 5, 300, MAX_PAYLOAD // 2))
+                payload = ''.join(chr(rng.randrange(0, 0x800)) for _ in range(0, length)).encode('utf-8')
+            sent.append((kind, payload))
+        stream = b''.join(encode_frame(kind, payload) for kind, payload in sent)
+        reader = FrameReader()
+        received = []
+        position = 0
+        while position < len(stream):
+            # from a single byte to the whole stream at a time.
+            size = rng.choice((1, 2, 3, rng.randint(1, 64), len(stream)))
+            received += reader.feed(stream[position:position + size])
+            position += size
+        assert received == sent, (sent, received)
+        assert reader.pending == 0
+        frames_read += len(received)
+
+        reader = FrameReader()
+        garbage = bytes(rng.randrange(0, 256) for _ in range(0, rng.randint(0, 64)))
+        try:
+            for start in range(0, len(garbage), 7):
+                for kind, payload in reader.feed(garbage[start:start + 7]):
+                    assert kind in MESSAGE_TYPES and len(payload) <= MAX_PAYLOAD
+                    check_payload(kind, payload)
+        except ProtocolError:
+            pass
+    return frames_read
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Wire protocol of the tic tac toe server.')
+    parser.add_argument('--fuzz', type=int, default=1000, metavar='ITERATIONS')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    frames = fuzz(args.fuzz, args.seed)
+    print(f'{args.fuzz} random streams, {frames} frames read back unchanged')
+    print(f'a movement takes {len(encode_move(1, 2, False))} bytes')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+    *
+    *   Resident engine: the enhanced machine player kept alive behind a line protocol over stdin / stdout,
+    *   similar to UCI. The transposition table and the tablebase stay warm between the queries, thus a bot
+    *   only pays the start up once.
+    *
+    *   Commands, one per line:
+    *       --> uci: it prints the engine id and its options, followed by uciok.
+    *       --> isready: it prints readyok, even while searching.
+    *       --> setoption name <name> value <value>: machine, human, rows, cols, win_length, use_tablebase,
+    *           move_ordering.
+    *       --> ucinewgame: it clears the transposition table.
+    *       --> position startpos | position <board>: the board the next go is searched on, written like
+    *           o_x/xoo/_x_. startpos is the empty board of rows x cols. The machine is the one to move.
+    *       --> go [depth <n>] [movetime <ms>] [time <ms>] [inc <ms>] [infinite]: it starts the search in the
+    *           background. time and inc are the machine's clock and increment, a share of them is spent on this
+    *           movement. infinite searches the whole tree and holds the answer back until stop. depth and
+    *           infinite skip the tablebase, so the search is carried out even on the 3 x 3 board. Once done, it
+    *           prints an info line and bestmove <i> <j>, or bestmove none if the game is over.
+    *       --> stop: it cancels the search in progress, which prints the best movement found so far.
+    *       --> quit
+    *   The queries may be pipelined: a command which needs the board (position, go, setoption, ucinewgame)
+    *   waits for the search in progress to finish, so the answers come out in the same order.
+    *
+    *   Usage: python -m resident_engine
+    *
+"""
+import sys
+import threading
+
+from engine_cli import parse_board
+from enhanced_machine_player import MachinePlayer
+from search_core import CancellationToken
+from tablebase import load_tablebase
+from transposition_table import default_table, symmetry_tables
+
+ENGINE_NAME = 'enhanced_machine_player'
+# seconds kept aside from the clock, so the reply arrives before the time runs out.
+TIME_SAFETY_MARGIN = 0.005
+# the least a search with a time control is given.
+MIN_MOVE_TIME = 0.001
+# option --> (type, default value)
+OPTIONS = {
+    'machine': (str, 'o'),
+    'human': (str, 'x'),
+    'rows': (int, 3),
+    'cols': (int, 3),
+    'win_length': (int, 3),
+    'use_tablebase': (bool, True),
+    'move_ordering': (bool, True),
+}
+
+
+def parse_option(kind, value):
+    if kind is bool:
+        if value.lower() not in ('true', 'false'):
+            raise ValueError(f'{value!r} is not true or false')
+        return value.lower() == 'true'
+    return kind(value)
+
+
+def move_time(clock, increment, empty_cells):
+    """
+    :param clock: seconds left in the machine's clock.
+    :param increment: seconds added to the clock after each movement.
+    :param empty_cells: empty cells of the board, the machine plays about half of them.
+    :return: seconds the search of this movement may take.
+    """
+    moves_left = max(1, (empty_cells + 1) // 2)
+    budget = clock / moves_left + increment
+    return max(MIN_MOVE_TIME, min(budget, clock - TIME_SAFETY_MARGIN))
+
+
+class ResidentEngine:
+    def __init__(self, output=sys.stdout, table=default_table):
+        """ :param output: text stream the answers are written to.
+            :param table: transposition table kept between the queries.
+        """
+        self.__output = output
+        self.__output_lock = threading.Lock()
+        self.__table = table
+        self.__options = {name: default for name, (kind, default) in OPTIONS.items()}
+        self.__board = None
+        self.__search = None
+        self.__cancel = None
+        self.__infinite = False
+        # the tables are warmed up once, not by the first query.
+        load_tablebase()
+        symmetry_tables()
+
+    @property
+    def searching(self):
+        return self.__search is not None and self.__search.is_alive()
+
+    def send(self, line):
+        with self.__output_lock:
+            self.__output.write(line + '\n')
+            self.__output.flush()
+
+    def wait(self):
+        """ It waits for the search in progress, if any, to finish. An infinite one is stopped, it never would. """
+        if self.__search is not None:
+            if self.__infinite:
+                self.__cancel.set()
+            self.__search.join()
+            self.__search = None
+
+    def stop(self):
+        if self.__cancel is not None:
+            self.__cancel.set()
+        self.wait()
+
+    def handle(self, line):
+        """
+        :return: False once quit has been received, otherwise True.
+        """
+        words = line.split()
+        if not words:
+            return True
+        command, arguments = words[0], words[1:]
+        try:
+            if command == 'quit':
+                self.stop()
+                return False
+            elif command == 'stop':
+                self.stop()
+            elif command == 'isready':
+                self.send('readyok')
+            elif command == 'uci':
+                self.send(f'id name {ENGINE_NAME}')
+                for name, (kind, default) in OPTIONS.items():
+                    self.send(f'option name {name} type {kind.__name__} default {str(default).lower()}')
+                self.send('uciok')
+            elif command == 'setoption':
+                self.wait()
+                self.__set_option(arguments)
+            elif command == 'ucinewgame':
+                self.wait()
+                if self.__table is not None:
+                    self.__table.clear()
+            elif command == 'position':
+                self.wait()
+                self.__set_position(arguments)
+            elif command == 'go':
+                self.wait()
+                self.__go(arguments)
+            else:
+                self.send(f'info string unknown command {command}')
+        except ValueError as error:
+            self.send(f'info string error {error}')
+        return True
+
+    def __set_option(self, arguments):
+        if len(arguments) != 4 or arguments[0] != 'name' or arguments[2] != 'value':
+            raise ValueError('expected setoption name <name> value <value>')
+        name, value = arguments[1], arguments[3]
+        if name not in OPTIONS:
+            raise ValueError(f'unknown option {name}')
+        self.__options[name] = parse_option(OPTIONS[name][0], value)
+
+    def __set_position(self, arguments):
+        if not arguments:
+            raise ValueError('expected position startpos or position <board>')
+        if arguments[0] == 'startpos':
+            self.__board = None
+        else:
+            self.__board = parse_board(arguments[0])
+
+    def __go(self, arguments):
+        limits = {}
+        index = 0
+        while index < len(arguments):
+            name = arguments[index]
+            if name == 'infinite':
+                limits[name] = True
+                index += 1
+            elif name in ('depth', 'movetime', 'time', 'inc') and index + 1 < len(arguments):
+                limits[name] = int(arguments[index + 1])
+                index += 2
+            else:
+                raise ValueError(f'unexpected go argument {name}')
+
+        options = self.__options
+        board = self.__board
+        if board is None:
+            board = [['_' for _ in range(0, options['cols'])] for _ in range(0, options['rows'])]
+        empty_cells = sum(row.count('_') for row in board)
+        time_limit = None
+        if 'movetime' in limits:
+            time_limit = limits['movetime'] / 1000
+        elif 'time' in limits:
+            time_limit = move_time(limits['time'] / 1000, limits.get('inc', 0) / 1000, empty_cells)
+        max_depth = limits.get('depth')
+        if limits.get('infinite'):
+            # the whole tree, deepening until stop is received.
+            max_depth, time_limit = empty_cells, None
+        elif time_limit is not None and max_depth is None:
+            # the time control sets how deep the search goes.
+            max_depth = empty_cells
+        # the tablebase answers at once, ignoring how deep the search was asked to go.
+        use_tablebase = options['use_tablebase'] and 'depth' not in limits and not limits.get('infinite')
+        player = MachinePlayer(board, options['machine'], options['human'], table=self.__table,
+                               use_tablebase=use_tablebase, win_length=options['win_length'],
+                               max_depth=max_depth, time_limit=time_limit, move_ordering=options['move_ordering'],
+                               collect_stats=True)
+        self.__cancel = CancellationToken()
+        self.__infinite = bool(limits.get('infinite'))
+        self.__search = threading.Thread(target=self.__run, args=(player, self.__cancel, self.__infinite),
+                                         daemon=True)
+        self.__search.start()
+
+    def __run(self, player, cancel, infinite):
+        try:
+            move = player.get_optimal_move(cancel=cancel)
+        except Exception as error:
+            self.send(f'info string error {error}')
+            self.send('bestmove none')
+            return
+        if infinite:
+            # the whole tree may be searched already, the answer still waits for stop.
+            cancel.wait()
+        stats = player.last_stats
+        self.send(f'info depth {stats.max_depth} nodes {stats.nodes} tbhits {stats.tablebase_hits} '
+                  f'time {round(stats.elapsed * 1000)}')
+        self.send('bestmove none' if move is None else f'bestmove {move[0]} {move[1]}')
+
+
+def run(stream=sys.stdin, output=sys.stdout):
+    engine = ResidentEngine(output)
+    for line in stream:
+        if not engine.handle(line):
+            return
+    # the input has been closed, the last search still answers.
+    engine.wait()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,306 @@
+"""
+    *
+    *   In place search core of the enhanced machine player.
+    *
+    *   The Minmax algorithm with alpha-beta-pruning is carried out over a single board: both players' masks are
+    *   kept by the core and every movement is made before searching the child and unmade right afterwards.
+    *   No state nor board is allocated per node, and the only thing kept from the tree is the principal
+    *   variation: the sequence of optimal movements from the root.
+    *
+    *   The values are the same as the ones of the State based search (1, 2, 3 and the heuristic values in
+    *   between), and so are the cutoffs and the entries stored in the transposition table.
+    *
+    *   The counters of a search are gathered, on demand, by a SearchStats object. Any function registered with
+    *   register_stats_hook receives them after each movement of the machine players.
+    *
+"""
+import threading
+import time
+
+from transposition_table import lookup, store_result
+from win_detection import is_winning_move
+
+
+class SearchTimeout(Exception):
+    """ Raised within the search once the deadline has been reached or the search has been cancelled. """
+
+
+class CancellationToken(threading.Event):
+    """
+    Token handed to a search so it may be stopped from another thread. Once it's cancelled, the search returns
+    the best movement of the deepest iteration completed.
+    """
+
+    def cancel(self):
+        self.set()
+
+    @property
+    def cancelled(self):
+        return self.is_set()
+
+
+class SearchStats:
+    # a few counters updated at every node, thus no per instance dictionary is needed.
+    __slots__ = ('nodes', 'leaf_evaluations', 'alpha_cutoffs', 'beta_cutoffs', 'max_depth', 'table_hits',
+                 'tablebase_hits', 'elapsed', 'root_depth')
+
+    def __init__(self):
+        """
+        Counters of the searches carried out to come up with a movement:
+            --> nodes: nodes expanded, that is, the ones whose children have been searched.
+            --> leaf_evaluations: static evaluations of ending states or of the states at the maximum depth.
+            --> alpha_cutoffs: cutoffs of the minimizing player, the value fell to alpha.
+            --> beta_cutoffs: cutoffs of the maximizing player, the value rose to beta.
+            --> max_depth: the deepest ply reached from the root.
+            --> table_hits: positions whose value was found in the transposition table.
+            --> tablebase_hits: movements read from the tablebase, without any search.
+            --> elapsed: seconds taken, set once the movement has been found.
+        """
+        self.nodes = 0
+        self.leaf_evaluations = 0
+        self.alpha_cutoffs = 0
+        self.beta_cutoffs = 0
+        self.max_depth = 0
+        self.table_hits = 0
+        self.tablebase_hits = 0
+        self.elapsed = 0.0
+        # depth the current root search started with, so the ply of a node is root_depth minus its depth.
+        self.root_depth = 0
+
+    def leaf(self, ply):
+        self.leaf_evaluations += 1
+        if ply > self.max_depth:
+            self.max_depth = ply
+
+    def merge(self, other):
+        """ It adds up the counters of another search, such as the one of a process of the pool. """
+        self.nodes += other.nodes
+        self.leaf_evaluations += other.leaf_evaluations
+        self.alpha_cutoffs += other.alpha_cutoffs
+        self.beta_cutoffs += other.beta_cutoffs
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.table_hits += other.table_hits
+        self.tablebase_hits += other.tablebase_hits
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'root_depth'}
+
+    def __repr__(self):
+        return 'SearchStats(' + ', '.join(f'{name}={value!r}' for name, value in self.as_dict().items()) + ')'
+
+
+# functions called with the SearchStats of every movement found by the machine players.
+_stats_hooks = []
+
+
+def register_stats_hook(hook):
+    """ :param hook: callable which receives the SearchStats after each movement. """
+    _stats_hooks.append(hook)
+
+
+def unregister_stats_hook(hook):
+    _stats_hooks.remove(hook)
+
+
+def stats_hooks_registered():
+    return bool(_stats_hooks)
+
+
+def notify_stats_hooks(stats):
+    for hook in tuple(_stats_hooks):
+        hook(stats)
+
+
+class SearchCore:
+    def __init__(self, geometry, table=None, deadline=None, stats=None):
+        """ :param geometry: shape of the board, the Geometry of the enhanced machine player.
+            :param table: transposition table, None disables it.
+            :param deadline: time.perf_counter() value at which the search is stopped.
+            :param stats: SearchStats updated by the search, None disables the counters.
+        """
+        self.geometry = geometry
+        self.table = table
+        self.deadline = deadline
+        self.stats = stats
+        self.machine_mask = 0
+        self.human_mask = 0
+        self.nodes = 0
+        # triangular table: the row of each ply holds the principal variation found from it.
+        self.pv = [[0] * (geometry.cells + 1) for _ in range(0, geometry.cells + 1)]
+        self.pv_length = [0] * (geometry.cells + 1)
+
+    @property
+    def principal_variation(self):
+        """ Cells, i * cols + j, of the optimal movements from the root found by the last search. """
+        return self.pv[0][:self.pv_length[0]]
+
+    def search_root(self, machine_mask, human_mask, depth):
+        """
+        The machine is the one to move. Only a strictly better child replaces the best one, thus the first
+        optimal movement in row-major order is returned.
+        :return: the tuple (best value, best cell, completed). If the deadline is reached, completed is False and
+            the best cell among the ones searched so far is returned. The best cell is None if the game is over.
+        """
+        self.machine_mask = machine_mask
+        self.human_mask = human_mask
+        self.nodes = 0
+        self.pv_length[0] = 0
+        if self._ending(machine_mask, human_mask):
+            # the nodes below only check the lines of the last movement, which needs a root still in play.
+            return self.geometry.evaluate(machine_mask, human_mask), None, True
+        if self.stats is not None:
+            self.stats.nodes += 1
+        occupied = machine_mask | human_mask
+        best_value = -1000
+        best_cell = None
+        for cell, bit in enumerate(self.geometry.cell_bits):
+            if occupied & bit:
+                continue
+            # make the movement
+            self.machine_mask = machine_mask | bit
+            try:
+                child_value = self.min_value(depth - 1, best_value, 1000, 1, cell)
+            except SearchTimeout:
+                return best_value, best_cell, False
+            finally:
+                # unmake it
+                self.machine_mask = machine_mask
+            if child_value > best_value:
+                best_value = child_value
+                best_cell = cell
+                self._update_pv(0, cell)
+        return best_value, best_cell, True
+
+    def _update_pv(self, ply, cell):
+        """ The principal variation of the ply is the movement followed by the one of the next ply. """
+        pv = self.pv
+        row = pv[ply]
+        row[ply] = cell
+        next_length = self.pv_length[ply + 1]
+        if next_length > ply + 1:
+            row[ply + 1:next_length] = pv[ply + 1][ply + 1:next_length]
+            self.pv_length[ply] = next_length
+        else:
+            self.pv_length[ply] = ply + 1
+
+    def _ending(self, machine_mask, human_mask):
+        geometry = self.geometry
+        if machine_mask | human_mask == geometry.full_board:
+            return True
+        winning_boards = geometry.winning_boards
+        if winning_boards is not None:
+            return winning_boards[human_mask] or winning_boards[machine_mask]
+        return geometry.is_win(human_mask) or geometry.is_win(machine_mask)
+
+    def _ending_after(self, player_mask, cell):
+        """
+        Whether the game is over once the player has placed its token in the cell. The game was not over before
+        the movement, so only the player and the lines through the cell need to be checked.
+        """
+        geometry = self.geometry
+        if self.machine_mask | self.human_mask == geometry.full_board:
+            return True
+        winning_boards = geometry.winning_boards
+        if winning_boards is not None:
+            return winning_boards[player_mask]
+        return is_winning_move(player_mask, cell, geometry.rows, geometry.cols, geometry.win_length)
+
+    def max_value(self, depth, alpha, beta, ply, cell):
+        """ :param cell: the last movement, made by the human. """
+        machine_mask = self.machine_mask
+        human_mask = self.human_mask
+        self.pv_length[ply] = ply
+        stats = self.stats
+        if depth == 0 or self._ending_after(human_mask, cell):
+            if stats is not None:
+                stats.leaf(ply)
+            # perform the static evaluation
+            return self.geometry.evaluate(machine_mask, human_mask)
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        self.nodes += 1
+        if stats is not None:
+            stats.nodes += 1
+        table = self.table
+        if table is not None:
+            # the position, or any of its symmetric ones, may have been searched already.
+            key = self.geometry.key(machine_mask, human_mask, True)
+            entry = lookup(table, key, depth, alpha, beta)
+            if entry is not None:
+                if stats is not None:
+                    stats.table_hits += 1
+                return entry[0]
+            alpha_orig = alpha
+        v = -1000
+        occupied = machine_mask | human_mask
+        for cell, bit in enumerate(self.geometry.cell_bits):
+            if occupied & bit:
+                continue
+            self.machine_mask = machine_mask | bit
+            child_value = self.min_value(depth - 1, alpha, beta, ply + 1, cell)
+            self.machine_mask = machine_mask
+            if child_value > v:
+                v = child_value
+            if v > alpha:
+                alpha = v
+                self._update_pv(ply, cell)
+            # performs the cutoff if necessary
+            if alpha >= beta:
+                if stats is not None:
+                    stats.beta_cutoffs += 1
+                if table is not None:
+                    store_result(table, key, alpha, alpha_orig, beta, depth)
+                return alpha
+        if table is not None:
+            store_result(table, key, v, alpha_orig, beta, depth)
+        return v
+
+    def min_value(self, depth, alpha, beta, ply, cell):
+        """ :param cell: the last movement, made by the machine. """
+        machine_mask = self.machine_mask
+        human_mask = self.human_mask
+        self.pv_length[ply] = ply
+        stats = self.stats
+        if depth == 0 or self._ending_after(machine_mask, cell):
+            if stats is not None:
+                stats.leaf(ply)
+            # perform the static evaluation
+            return self.geometry.evaluate(machine_mask, human_mask)
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        self.nodes += 1
+        if stats is not None:
+            stats.nodes += 1
+        table = self.table
+        if table is not None:
+            # the position, or any of its symmetric ones, may have been searched already.
+            key = self.geometry.key(machine_mask, human_mask, False)
+            entry = lookup(table, key, depth, alpha, beta)
+            if entry is not None:
+                if stats is not None:
+                    stats.table_hits += 1
+                return entry[0]
+            beta_orig = beta
+        v = 1000
+        occupied = machine_mask | human_mask
+        for cell, bit in enumerate(self.geometry.cell_bits):
+            if occupied & bit:
+                continue
+            self.human_mask = human_mask | bit
+            child_value = self.max_value(depth - 1, alpha, beta, ply + 1, cell)
+            self.human_mask = human_mask
+            if child_value < v:
+                v = child_value
+            if v < beta:
+                beta = v
+                self._update_pv(ply, cell)
+            # performs the cutoff if necessary
+            if alpha >= beta:
+                if stats is not None:
+                    stats.alpha_cutoffs += 1
+                if table is not None:
+                    store_result(table, key, beta, alpha, beta_orig, depth)
+                return beta
+        if table is not None:
+            store_result(table, key, v, alpha, beta_orig, depth)
+        return v
@@ -0,0 +1,171 @@
+"""
+    *
+    *   Search tree kept in memory, for the modes which need the nodes once the search is over: the analysis of
+    *   a position and the reuse of the tree between movements.
+    *
+    *   A node does not carry a board. It only stores the movement which led to it (the cell i * cols + j),
+    *   the link to its parent, its value, the side to move and its children once it has been expanded. The
+    *   board of any node is rebuilt on demand by playing the movements from the root, which is the only node
+    *   holding both players' masks.
+    *
+"""
+from enhanced_machine_player import DEFAULT_GEOMETRY, get_geometry
+from position_index import board_masks, mask_to_board
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'value', 'machine_turn', 'children')
+
+    def __init__(self, move, parent, machine_turn, value=0):
+        """ :param move: cell, i * cols + j, of the token placed by the parent to reach this node.
+            :param parent: the parent node.
+            :param machine_turn: whether the machine is the one to move.
+            :param value: the same values as the State ones, 0 until the node is evaluated.
+            The children are None until the node is expanded, and an empty tuple if the game is over.
+        """
+        self.move = move
+        self.parent = parent
+        self.value = value
+        self.machine_turn = machine_turn
+        self.children = None
+
+    @property
+    def root(self):
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    @property
+    def geometry(self):
+        return self.root.geometry
+
+    @property
+    def coordinates(self):
+        """ The (i, j) coordinates of the movement which led to the node. """
+        return divmod(self.move, self.geometry.cols)
+
+    def masks(self):
+        """ It plays the movements from the root and returns the pair (machine_mask, human_mask). """
+        machine_mask = 0
+        human_mask = 0
+        node = self
+        while node.parent is not None:
+            # the movement was made by the side to move of the parent.
+            if node.machine_turn:
+                human_mask |= 1 << node.move
+            else:
+                machine_mask |= 1 << node.move
+            node = node.parent
+        return machine_mask | node.machine_mask, human_mask | node.human_mask
+
+    @property
+    def board(self):
+        """ The nested list board is rebuilt on demand. """
+        root = self.root
+        machine_mask, human_mask = self.masks()
+        return mask_to_board(machine_mask, human_mask, root.machine, root.human, root.geometry.rows,
+                             root.geometry.cols)
+
+    def ending_state(self):
+        machine_mask, human_mask = self.masks()
+        return _ending(self.geometry, machine_mask, human_mask)
+
+    def expand(self):
+        """ It generates the children, in row-major order, unless they have been generated already. """
+        if self.children is None:
+            machine_mask, human_mask = self.masks()
+            self.children = _new_children(self, self.geometry, machine_mask, human_mask)
+        return self.children
+
+    def best_child(self):
+        """ The first child in row-major order with the best value for the side to move. """
+        if not self.children:
+            return None
+        best = self.children[0]
+        for child in self.children:
+            if child.value > best.value if self.machine_turn else child.value < best.value:
+                best = child
+        return best
+
+    def child(self, move):
+        """ The child reached through the cell, expanding the node if needed. """
+        for child in self.expand():
+            if child.move == move:
+                return child
+        return None
+
+
+class RootNode(Node):
+    __slots__ = ('machine_mask', 'human_mask', 'geometry', 'machine', 'human')
+
+    def __init__(self, machine_mask, human_mask, machine_turn, machine='O', human='X', geometry=DEFAULT_GEOMETRY):
+        super().__init__(None, None, machine_turn)
+        self.machine_mask = machine_mask
+        self.human_mask = human_mask
+        self.geometry = geometry
+        self.machine = machine
+        self.human = human
+
+    @classmethod
+    def from_board(cls, board, machine_turn, machine='O', human='X', win_length=3):
+        geometry = get_geometry(len(board), len(board[0]), win_length)
+        return cls(*board_masks(board, machine, human), machine_turn, machine, human, geometry)
+
+    @property
+    def root(self):
+        return self
+
+    def masks(self):
+        return self.machine_mask, self.human_mask
+
+
+def _ending(geometry, machine_mask, human_mask):
+    return machine_mask | human_mask == geometry.full_board or geometry.is_win(machine_mask) \
+        or geometry.is_win(human_mask)
+
+
+def _new_children(node, geometry, machine_mask, human_mask):
+    if _ending(geometry, machine_mask, human_mask):
+        return ()
+    occupied = machine_mask | human_mask
+    machine_turn = not node.machine_turn
+    return tuple(Node(cell, node, machine_turn) for cell, bit in enumerate(geometry.cell_bits)
+                 if not occupied & bit)
+
+
+def build_tree(node, depth=None):
+    """
+    It expands the whole tree below the node, or up to depth moves ahead, and sets the minmax value of every
+    node. Nothing is pruned, so every node keeps its exact value for the analysis.
+    :return: the number of nodes of the tree, the node included.
+    """
+    geometry = node.geometry
+    machine_mask, human_mask = node.masks()
+    if depth is None:
+        depth = geometry.cells
+    return _build(node, geometry, machine_mask, human_mask, depth)
+
+
+def _build(node, geometry, machine_mask, human_mask, depth):
+    if depth == 0:
+        # the heuristic evaluation at the depth limit. The node is left unexpanded, if it was, so a later
+        # build goes deeper from it.
+        node.value = geometry.evaluate(machine_mask, human_mask)
+        return 1
+    if node.children is None:
+        node.children = _new_children(node, geometry, machine_mask, human_mask)
+    if not node.children:
+        # the game is over: the static evaluation.
+        node.value = geometry.evaluate(machine_mask, human_mask)
+        return 1
+    count = 1
+    for child in node.children:
+        bit = 1 << child.move
+        if node.machine_turn:
+            count += _build(child, geometry, machine_mask | bit, human_mask, depth - 1)
+        else:
+            count += _build(child, geometry, machine_mask, human_mask | bit, depth - 1)
+    values = [child.value for child in node.children]
+    node.value = max(values) if node.machine_turn else min(values)
+    return count
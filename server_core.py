@@ -0,0 +1,516 @@
+"""
+    *
+    *   Networking core of the tic tac toe server: a single thread serves every connection.
+    *
+    *   The sockets are non-blocking and multiplexed with selectors, so one thread handles thousands of clients
+    *   instead of one thread blocked on recv per client. Each connection keeps:
+    *       --> a frame reader: the bytes received are buffered and every complete message is handled, however
+    *           the stream has been split or coalesced on its way.
+    *       --> an output buffer: whatever the socket does not take at once is kept and written once it's
+    *           writable again, thus a slow client never blocks the others.
+    *   The backlog of the listening socket is configurable, DEFAULT_BACKLOG by default, so a burst of
+    *   connections is queued instead of dropped. The kernel caps it at net.core.somaxconn.
+    *
+    *   The messages are the binary frames of protocol. The clients are paired into game rooms as they connect
+    *   (see matchmaking), and every message is only sent to the players of the sender's room. Each room keeps
+    *   the latest messages of its game in a bounded move log, optionally appended to a file (see move_log).
+    *
+    *   The status of the server is written to the 'server' logger as events with fields, e.g. the event
+    *   'connected' with the address of the client and its room. The daemon (see server_daemon) writes them as
+    *   key=value or JSON lines, the window of server_gui into its panel.
+    *
+    *   shutdown stops it gracefully: the listening socket is closed, so no client joins any longer, and the
+    *   clients connected are closed once the bytes pending to be sent to them are written, or once the timeout
+    *   runs out. Then the move log is flushed.
+    *
+    *   Usage: python server_core.py [--host 0.0.0.0] [--port 5050] [--backlog 1024]
+    *          python server_core.py --benchmark 10 1000 10000
+    *
+"""
+import argparse
+import logging
+import selectors
+import socket
+import sys
+import time
+
+from matchmaking import ROOM_SIZE, Matchmaker
+from move_log import DEFAULT_CAPACITY, LogWriter, MoveLog
+from protocol import DISCONNECT, FrameReader, ProtocolError, describe, encode_frame, encode_text
+
+PORT = 5050
+DEFAULT_BACKLOG = 1024
+# bytes read from a socket at a time.
+RECV_SIZE = 4096
+# connections accepted at a time, so a burst of them does not starve the clients already connected.
+ACCEPT_BATCH = 256
+# seconds a graceful shutdown waits for the bytes pending to be sent to the clients.
+SHUTDOWN_TIMEOUT = 5.0
+
+logger = logging.getLogger('server')
+
+
+def log_event(log, event, level=logging.INFO, **fields):
+    """
+    It writes the event to the logger. The message is the event followed by its fields as key=value, and the
+    record keeps both as its event and fields attributes, for the formatters.
+    :param log: logging.Logger, None to drop the event.
+    """
+    if log is None or not log.isEnabledFor(level):
+        return
+    message = ' '.join([event] + [f'{key}={value}' for key, value in fields.items()])
+    log.log(level, message, extra={'event': event, 'fields': fields})
+
+
+class Connection:
+    __slots__ = ('sock', 'address', 'reader', 'pending', 'closing', 'room', 'seat')
+
+    def __init__(self, sock, address):
+        """ :param sock: the non-blocking socket of the client.
+            :param address: the (host, port) the client connects from.
+        """
+        self.sock = sock
+        self.address = address
+        # it keeps the bytes received which do not make up a whole frame yet.
+        self.reader = FrameReader()
+        # bytes the socket has not taken yet.
+        self.pending = bytearray()
+        # whether the connection is closed once the pending bytes are written.
+        self.closing = False
+        # the game room of the client and its seat in it, set by the matchmaker.
+        self.room = None
+        self.seat = None
+
+
+class GameServer:
+    def __init__(self, host=None, port=PORT, backlog=DEFAULT_BACKLOG, on_message=None, log=logger,
+                 room_size=ROOM_SIZE, move_log_path=None, move_log_capacity=DEFAULT_CAPACITY):
+        """ :param host: address the server listens on. By default, the one of the host name.
+            :param port: port the server listens on, 0 lets the system pick a free one.
+            :param backlog: connections the system queues until they are accepted.
+            :param on_message: callable(connection, type, payload) called with every message received, before
+                it's sent to the clients.
+            :param log: logging.Logger the status events are written to, None to drop them.
+            :param room_size: players of every game room.
+            :param move_log_path: file the messages of every game are appended to, None to keep them in memory.
+            :param move_log_capacity: latest messages each game room keeps in memory.
+        """
+        self.__host = socket.gethostbyname(socket.gethostname()) if host is None else host
+        self.__port = port
+        self.__backlog = backlog
+        self.__on_message = on_message
+        self.__log = log
+        self.__selector = None
+        self.__listener = None
+        # both ends of the socket pair which wakes the loop up from another thread.
+        self.__waker = None
+        # socket --> Connection
+        self.__connections = {}
+        self.__matchmaker = Matchmaker(room_size)
+        self.__move_log_path = move_log_path
+        self.__move_log_capacity = move_log_capacity
+        self.__log_writer = None
+        self.__running = False
+        # seconds a shutdown requested waits for the clients, None if none has been requested.
+        self.__shutdown_timeout = None
+        # monotonic time the clients are closed at anyway, once the shutdown has begun.
+        self.__shutdown_deadline = None
+
+    @property
+    def address(self):
+        """ The (host, port) the server listens on, once it has been started. """
+        return None if self.__listener is None else self.__listener.getsockname()
+
+    @property
+    def backlog(self):
+        return self.__backlog
+
+    @property
+    def connections(self):
+        return len(self.__connections)
+
+    @property
+    def matchmaker(self):
+        return self.__matchmaker
+
+    @property
+    def running(self):
+        return self.__running
+
+    def start(self):
+        """ It binds the listening socket. The connections are served by serve_forever or poll. """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # It allows the server to be started again once it has been closed.
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            listener.bind((self.__host, self.__port))
+            listener.listen(self.__backlog)
+        except OSError:
+            listener.close()
+            raise
+        listener.setblocking(False)
+        self.__listener = listener
+        self.__selector = selectors.DefaultSelector()
+        self.__selector.register(listener, selectors.EVENT_READ, self.__accept)
+        if self.__move_log_path is not None:
+            self.__log_writer = LogWriter(self.__move_log_path)
+        self.__waker = socket.socketpair()
+        self.__waker[0].setblocking(False)
+        self.__selector.register(self.__waker[0], selectors.EVENT_READ, self.__wake)
+        self.__running = True
+        if self.__shutdown_timeout is not None:
+            # it was requested before the loop could be woken up.
+            self.__wake_up()
+        self._log('listening', host=self.address[0], port=self.address[1], backlog=self.__backlog,
+                  run=None if self.__log_writer is None else self.__log_writer.run)
+
+    def serve_forever(self):
+        """ It serves the connections until stop is called or a shutdown is over, then it closes every socket. """
+        if self.__listener is None and self.__selector is None:
+            self.start()
+        try:
+            while self.__running:
+                if self.__shutdown_deadline is None:
+                    self.poll()
+                    continue
+                remaining = self.__shutdown_deadline - time.monotonic()
+                if not self.__connections or remaining <= 0:
+                    break
+                self.poll(remaining)
+        finally:
+            self.close()
+
+    def poll(self, timeout=None):
+        """ It handles the sockets which are ready, waiting up to timeout seconds for any (None, forever). """
+        for key, events in self.__selector.select(timeout):
+            if isinstance(key.data, Connection):
+                self.__serve(key.data, events)
+            else:
+                key.data()
+
+    def stop(self):
+        """ It makes serve_forever return at once, dropping the clients. It may be called from any thread. """
+        self.__running = False
+        self.__wake_up()
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        It makes serve_forever return gracefully: no client is accepted any longer, and every client is closed
+        once the bytes pending to be sent to it are written. It may be called from any thread and from a
+        signal handler.
+        :param timeout: seconds the clients are waited for, the ones left are dropped then.
+        """
+        if self.__shutdown_timeout is None:
+            self.__shutdown_timeout = timeout
+        self.__wake_up()
+
+    def close(self):
+        """ It closes every socket at once and flushes the move log. """
+        self.__running = False
+        dropped = len(self.__connections)
+        for connection in list(self.__connections.values()):
+            self.drop(connection)
+        if self.__selector is not None:
+            self.__selector.close()
+            self.__selector = None
+        if self.__listener is not None:
+            self.__listener.close()
+            self.__listener = None
+        if self.__waker is not None:
+            for end in self.__waker:
+                end.close()
+            self.__waker = None
+        if self.__log_writer is not None:
+            self.__log_writer.close()
+            self.__log_writer = None
+        self.__shutdown_timeout = None
+        self.__shutdown_deadline = None
+        self._log('closed', dropped=dropped)
+
+    def _log(self, event, level=logging.INFO, **fields):
+        log_event(self.__log, event, level, **fields)
+
+    def send(self, connection, data):
+        """ It writes the bytes to the client, keeping whatever the socket does not take at once. """
+        if connection.sock not in self.__connections:
+            return
+        if not connection.pending:
+            try:
+                sent = connection.sock.send(data)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self.drop(connection)
+                return
+            if sent == len(data):
+                return
+            data = data[sent:]
+            self.__selector.modify(connection.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, connection)
+        connection.pending += data
+
+    def broadcast(self, data):
+        """ It sends the bytes to every client, whatever its room. """
+        for connection in list(self.__connections.values()):
+            self.send(connection, data)
+
+    def send_room(self, connection, data):
+        """ It sends the bytes to the players of the client's room, the client included. """
+        for player in list(self.__matchmaker.peers(connection)):
+            self.send(player, data)
+
+    def handle_connect(self, connection):
+        """ It's called once a client has been accepted. It joins the open game room. """
+        room = self.__matchmaker.join(connection)
+        if room.log is None:
+            room.log = MoveLog(room.number, self.__move_log_capacity, self.__log_writer)
+        self._log('connected', client=_address(connection.address), room=room.number, seat=connection.seat,
+                  connections=len(self.__connections))
+
+    def handle_disconnect(self, connection):
+        """ It's called once a client has been closed, whoever closed it. It leaves its game room. """
+        room = self.__matchmaker.leave(connection)
+        self._log('disconnected', client=_address(connection.address), room=None if room is None else room.number,
+                  connections=len(self.__connections))
+
+    def handle_message(self, connection, kind, payload):
+        """ Every message is sent to the players of the room. A client leaves once it sends DISCONNECT. """
+        if self.__log is not None and self.__log.isEnabledFor(logging.DEBUG):
+            self._log('message', logging.DEBUG, client=_address(connection.address),
+                      room=None if connection.room is None else connection.room.number,
+                      text=describe(kind, payload))
+        if self.__on_message is not None:
+            self.__on_message(connection, kind, payload)
+        if connection.room is not None:
+            connection.room.log.append(connection.seat, kind, payload)
+        self.send_room(connection, encode_frame(kind, payload))
+        if kind == DISCONNECT:
+            self.disconnect(connection)
+
+    def disconnect(self, connection):
+        """ It closes the connection once the bytes pending to be sent to it have been written. """
+        if connection.pending:
+            connection.closing = True
+        else:
+            self.drop(connection)
+
+    def drop(self, connection):
+        """ It closes the connection at once. """
+        if self.__connections.pop(connection.sock, None) is None:
+            return
+        self.__selector.unregister(connection.sock)
+        connection.sock.close()
+        self.handle_disconnect(connection)
+
+    def __accept(self):
+        for _ in range(0, ACCEPT_BATCH):
+            try:
+                sock, address = self.__listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as error:
+                # e.g. out of file descriptors: the client stays queued in the backlog meanwhile.
+                self._log('accept_failed', logging.ERROR, error=error)
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = Connection(sock, address)
+            self.__connections[sock] = connection
+            self.__selector.register(sock, selectors.EVENT_READ, connection)
+            self.handle_connect(connection)
+
+    def __wake_up(self):
+        if self.__waker is not None:
+            try:
+                self.__waker[1].send(b'\0')
+            except OSError:
+                # the loop is already gone, or it has been woken up already.
+                pass
+
+    def __wake(self):
+        try:
+            while self.__waker[0].recv(RECV_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+        if self.__shutdown_timeout is not None and self.__shutdown_deadline is None:
+            self.__begin_shutdown()
+
+    def __begin_shutdown(self):
+        # it runs in the thread of the loop, whatever thread asked for the shutdown.
+        self.__shutdown_deadline = time.monotonic() + self.__shutdown_timeout
+        self._log('shutting_down', connections=len(self.__connections), timeout=self.__shutdown_timeout)
+        self.__selector.unregister(self.__listener)
+        self.__listener.close()
+        self.__listener = None
+        for connection in list(self.__connections.values()):
+            self.disconnect(connection)
+
+    def __serve(self, connection, events):
+        if events & selectors.EVENT_WRITE:
+            self.__flush(connection)
+        if events & selectors.EVENT_READ and connection.sock in self.__connections:
+            try:
+                data = connection.sock.recv(RECV_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                data = b''
+            if not data:
+                # the client has gone.
+                self.drop(connection)
+                return
+            try:
+                for kind, payload in connection.reader.feed(data):
+                    if connection.sock not in self.__connections:
+                        break
+                    self.handle_message(connection, kind, payload)
+            except ProtocolError as error:
+                self._log('bad_frame', logging.WARNING, client=_address(connection.address), error=error)
+                self.drop(connection)
+
+    def __flush(self, connection):
+        try:
+            sent = connection.sock.send(connection.pending)
+        except BlockingIOError:
+            return
+        except OSError:
+            self.drop(connection)
+            return
+        del connection.pending[:sent]
+        if not connection.pending:
+            if connection.closing:
+                self.drop(connection)
+            else:
+                self.__selector.modify(connection.sock, selectors.EVENT_READ, connection)
+
+
+def _address(address):
+    return f'{address[0]}:{address[1]}'
+
+
+def _serve_benchmark(backlog, pipe):
+    """ The server of the benchmark, run in its own process. It reports when each client was accepted. """
+    accepted = {}
+
+    class TimedServer(GameServer):
+        def handle_connect(self, connection):
+            # the clients are told apart by their port.
+            accepted[connection.address[1]] = time.monotonic()
+            super().handle_connect(connection)
+
+    server = TimedServer('127.0.0.1', 0, backlog, log=None)
+    server.start()
+    pipe.send(server.address)
+    while server.running:
+        server.poll(0.05)
+        if pipe.poll():
+            pipe.recv()
+            pipe.send(accepted)
+            server.stop()
+    server.close()
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return 0.0, 0.0, 0.0
+    return values[len(values) // 2], values[min(len(values) - 1, len(values) * 99 // 100)], values[-1]
+
+
+def benchmark(clients, messages=100, backlog=DEFAULT_BACKLOG):
+    """
+    It runs the server in another process and connects the clients to it all at once, as a burst, thus they
+    are paired into rooms. Then, messages messages are sent one at a time by clients picked in turn, each one
+    waiting for its own message to come back from the server.
+    :return: a dictionary with the (median, 99th percentile, max) milliseconds of the connection (the
+        handshake is done), the accept (the server has accepted the connection) and the message round trip.
+    """
+    import multiprocessing
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve_benchmark, args=(backlog, child), daemon=True)
+    process.start()
+    address = parent.recv()
+
+    selector = selectors.DefaultSelector()
+    started = {}
+    connected = {}
+    sockets = []
+    start = time.monotonic()
+    for _ in range(0, clients):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        started[sock] = time.monotonic()
+        sock.connect_ex(address)
+        selector.register(sock, selectors.EVENT_WRITE)
+        sockets.append(sock)
+    while len(connected) < clients:
+        for key, _ in selector.select(1):
+            connected[key.fileobj] = time.monotonic()
+            selector.unregister(key.fileobj)
+    connect_seconds = time.monotonic() - start
+
+    round_trips = []
+    for index in range(0, messages):
+        sock = sockets[index * max(1, clients // messages) % clients]
+        # every message is unique, so it's not mistaken for a previous one.
+        data = encode_text(f'{index} False')
+        sent = time.monotonic()
+        sock.setblocking(True)
+        sock.sendall(data)
+        received = b''
+        # the messages of the other clients may come first, the round trip ends once its own arrives.
+        while data not in received:
+            chunk = sock.recv(RECV_SIZE)
+            if not chunk:
+                raise ConnectionError(f'the server closed the connection before message {index} came back')
+            received += chunk
+        round_trips.append(time.monotonic() - sent)
+        sock.setblocking(False)
+
+    parent.send('report')
+    accepted = parent.recv()
+    process.join()
+    accepts = [accepted[sock.getsockname()[1]] - started[sock] for sock in sockets
+               if sock.getsockname()[1] in accepted]
+    for sock in sockets:
+        sock.close()
+    selector.close()
+    return {
+        'clients': clients,
+        'connect_all_ms': connect_seconds * 1000,
+        'connect_ms': tuple(value * 1000 for value in _percentiles([connected[s] - started[s] for s in sockets])),
+        'accept_ms': tuple(value * 1000 for value in _percentiles(accepts)),
+        'message_ms': tuple(value * 1000 for value in _percentiles(round_trips)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tic tac toe server.')
+    parser.add_argument('--host', help='address to listen on, the one of the host name by default')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG)
+    parser.add_argument('--benchmark', type=int, nargs='+', metavar='CLIENTS',
+                        help='it measures the latencies with each number of simulated clients')
+    parser.add_argument('--messages', type=int, default=100, help='messages sent by the benchmark')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        print(f'{"clients":>8} {"connect all":>12} {"connect p50/p99/max":>22} {"accept p50/p99/max":>22} '
+              f'{"message p50/p99/max":>22}  (ms)')
+        for clients in args.benchmark:
+            row = benchmark(clients, args.messages, args.backlog)
+            print(f'{clients:>8} {row["connect_all_ms"]:>12.1f} '
+                  + ' '.join(f'{"/".join(f"{value:.2f}" for value in row[name]):>22}'
+                             for name in ('connect_ms', 'accept_ms', 'message_ms')))
+        return 0
+
+    # the server is run the way the daemon runs it.
+    from server_daemon import configure_logging, serve
+    configure_logging()
+    serve(GameServer(args.host, args.port, args.backlog))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+    *
+    *   Headless tic tac toe server: the server core run as a daemon, without wxPython.
+    *
+    *   The status events of the server are logged to stderr, one line each:
+    *       --> text: time, level, event and its fields as key=value.
+    *       --> json: a JSON object with the time, level, event and fields, for the log collectors.
+    *
+    *   SIGTERM and SIGINT shut the server down gracefully: it stops accepting clients, closes the connected
+    *   ones once their pending bytes are sent, and flushes the move log. A second signal drops the clients
+    *   left at once.
+    *
+    *   Usage: python -m server_daemon [--host 0.0.0.0] [--port 5050] [--backlog 1024] [--move-log moves.log]
+    *                                  [--log-format json] [--log-level DEBUG] [--shutdown-timeout 5]
+    *
+"""
+import argparse
+import json
+import logging
+import signal
+import sys
+import time
+
+from move_log import DEFAULT_CAPACITY
+from server_core import DEFAULT_BACKLOG, PORT, SHUTDOWN_TIMEOUT, GameServer, log_event, logger
+
+LOG_FORMATS = ('text', 'json')
+
+
+class JsonFormatter(logging.Formatter):
+    """ It writes every record as a JSON object: time, level, event and the fields of the event. """
+
+    def format(self, record):
+        entry = {'time': self.formatTime(record), 'level': record.levelname,
+                 'event': getattr(record, 'event', record.getMessage())}
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+    def formatTime(self, record, datefmt=None):
+        # ISO 8601 in UTC, the one the log collectors parse.
+        return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z'
+
+
+def configure_logging(log_format='text', level=logging.INFO, stream=None):
+    """
+    It writes the events of the server logger to the stream, stderr by default.
+    :return: the handler added.
+    """
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f'log_format must be one of {LOG_FORMATS}')
+    handler = logging.StreamHandler(stream)
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    # the events are not written twice by the handlers of the root logger.
+    logger.propagate = False
+    return handler
+
+
+def serve(server, shutdown_timeout=SHUTDOWN_TIMEOUT):
+    """
+    It serves the clients in the current thread, the main one, until SIGTERM or SIGINT shuts the server down.
+    The previous handlers of the signals are restored afterwards.
+    """
+    def handle_signal(number, frame):
+        # the handler only asks the loop to stop, the logging is not safe to reenter from here.
+        requested.append(number)
+        if len(requested) > 1:
+            # the second signal: the clients are not waited for any longer.
+            server.stop()
+        else:
+            server.shutdown(shutdown_timeout)
+
+    requested = []
+    previous = {number: signal.signal(number, handle_signal) for number in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        server.serve_forever()
+    finally:
+        for number, handler in previous.items():
+            signal.signal(number, handler)
+    for number in requested:
+        log_event(logger, 'signal', name=signal.Signals(number).name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless tic tac toe server.')
+    parser.add_argument('--host', help='address to listen on, the one of the host name by default')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG)
+    parser.add_argument('--move-log', help='file the messages of every game are appended to')
+    parser.add_argument('--move-log-capacity', type=int, default=DEFAULT_CAPACITY,
+                        help='latest messages each game room keeps in memory')
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default='text')
+    parser.add_argument('--log-level', default='INFO', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'),
+                        help='DEBUG logs every message of the players as well')
+    parser.add_argument('--shutdown-timeout', type=float, default=SHUTDOWN_TIMEOUT,
+                        help='seconds the clients are waited for once the server is asked to stop')
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_format, args.log_level)
+    server = GameServer(args.host, args.port, args.backlog, move_log_path=args.move_log,
+                        move_log_capacity=args.move_log_capacity)
+    try:
+        server.start()
+    except OSError as error:
+        log_event(logger, 'start_failed', logging.ERROR, error=error)
+        return 1
+    serve(server, args.shutdown_timeout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,102 +1,70 @@
-import socket
+"""
+    *
+    *   Window of the server: a thin front end of server_core, which runs it in a thread of its own and shows its
+    *   events in a panel. The server runs without wxPython as well, see server_daemon.
+    *
+"""
+import logging
 import threading
 import wx
 
-HEADERSIZE = 67
-PORT = 5050
-SERVER = socket.gethostbyname(socket.gethostname())
-ADDR = (SERVER, PORT)
-FORMAT = 'utf-8'
-DISCONNECTED = 'disconnectclient'
-client_list = []
-# it contains all the data shared between the clients
-all_msgs = ""
-
-# ipv4 & TCP
-server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-# It allows the server to be started again, once it has been run the close func
-server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
-
-def handle_client(conn, addr):
-    """it will handle all the communication between the server and the clients"""
-    print(f'[NEW CONNECTION] {addr} connected.')
-
-    connected = True
-
-    while connected:
-        # wait to receive connection from the client
-        # The first msg tells us how long the msg is, so we'll convert into an integer
-        msg_length = conn.recv(HEADERSIZE).decode(FORMAT)
-        if msg_length:
-            msg_length = int(msg_length)
-            # we'll receive the actual msg with the exactly length
-            msg = conn.recv(msg_length).decode(FORMAT)
-            global all_msgs
-            all_msgs = all_msgs + msg + " "
-            if msg == DISCONNECTED:
-                connected = False
-            print(f'[{addr}] {msg}')
-            # send back a msm to the client from the server
-            for client in client_list:
-                client.send(msg.encode(FORMAT))
-    conn.close()
+from server_core import DEFAULT_BACKLOG, PORT, GameServer, log_event, logger
 
+# connections queued by the system until the server accepts them.
+BACKLOG = DEFAULT_BACKLOG
+# file the movements of every game are appended to, None keeps only the latest ones of each game in memory.
+MOVE_LOG_PATH = None
+# the server core is created again on every start, so it can be started once it has been closed.
+server = None
 
-def start(server_window_instance):
-    global server
-    server.bind(ADDR)
 
-    # print out the data in the panel
-    msg = "[STARTING] server is starting... \n"
-    server_window_instance.stdout.SetLabel(msg)
-    print('[STARTING] server is starting... ')
+class PanelHandler(logging.Handler):
+    """ It writes the events of the server into the panel of the window, and to stdout. """
 
-    server.listen(1)
-    msg = msg + f'[LISTENING] Server is listening on {SERVER} \n'
-    server_window_instance.stdout.SetLabel(msg)
-    print(f'[LISTENING] Server is listening on {SERVER}')
+    def __init__(self, server_window_instance):
+        super().__init__()
+        self.__window = server_window_instance
 
-    thread = threading.Thread(target=accept_clients, args=(server, server_window_instance), daemon=True)
-    thread.daemon = True
-    thread.start()
+    def emit(self, record):
+        text = self.format(record)
+        print(text)
+        # the server runs in its own thread, the panel is only updated by the GUI one.
+        wx.CallAfter(self.__append, text)
 
-    msg = msg + "[ACCEPTING NEW CLIENTS TO THE SERVER]\n" + ' ' + '*'*59 + '\n'
-    server_window_instance.stdout.SetLabel(msg)
-    print("[ACCEPTING NEW CLIENTS TO THE SERVER]")
+    def __append(self, text):
+        self.__window.stdout.SetLabel(self.__window.stdout.GetLabel() + text + '\n')
 
-    server_window_instance.host_info_text.SetLabel(str(SERVER))
-    server_window_instance.port_info_text.SetLabel(str(PORT))
 
+def start(server_window_instance):
+    global server
+    if server is not None and server.running:
+        return
+    server_window_instance.stdout.SetLabel("[STARTING] server is starting... \n")
+    print('[STARTING] server is starting... ')
 
-def accept_clients(server, server_windows_instance):
+    # a single thread serves every client.
+    server = GameServer(port=PORT, backlog=BACKLOG, move_log_path=MOVE_LOG_PATH)
+    try:
+        server.start()
+    except OSError as error:
+        # the port may still be held, such as right after a shutdown: the error is shown in the panel.
+        log_event(logger, 'start_failed', logging.ERROR, error=error)
+        server = None
+        return
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
 
-    while True:
-        # conn: it stores the socket object that allow us to send back information
-        # addr: information about the connection
-        conn, addr = server.accept()
-        client_list.append(conn)
-        # create another thread to avoid the blockers to stop the GUI main loop
-        thread = threading.Thread(target=handle_client, args=(conn, addr))
-        thread.daemon = True
-        thread.start()
-        msg = server_windows_instance.stdout.GetLabel()
-        msg = msg + f'[ACTIVE CONNECTIONS] {threading.active_count() - 2}\n'
-        server_windows_instance.stdout.SetLabel(msg)
-        print(f'[ACTIVE CONNECTIONS] {threading.active_count() - 2}')
+    host, port = server.address
+    server_window_instance.host_info_text.SetLabel(str(host))
+    server_window_instance.port_info_text.SetLabel(str(port))
 
 
 def close(server_window_instance):
-    """modo chapuza, no va del tod0 bien"""
-
+    """ It shuts the server down gracefully, in its own thread: see GameServer.shutdown. """
     global server
-    # server.shutdown(socket.SHUT_RDWR)
-
-    server.close()
-    msg = server_window_instance.stdout.GetLabel()
-    msg = msg + "[SERVER CLOSED]\n"
-    server_window_instance.stdout.SetLabel(msg)
-    print('SERVER CLOSED')
+    if server is not None:
+        server.shutdown()
+        server = None
 
     server_window_instance.host_info_text.SetLabel('___.___.___.___')
     server_window_instance.port_info_text.SetLabel('_______')
@@ -168,7 +136,15 @@ class ServerWindow(wx.Frame):
         close(self)
 
 
-app = wx.App(False)
-frame = ServerWindow()
-frame.Show()
-app.MainLoop()
+def main():
+    app = wx.App(False)
+    frame = ServerWindow()
+    # the moves of the players are shown as well.
+    logger.addHandler(PanelHandler(frame))
+    logger.setLevel(logging.DEBUG)
+    frame.Show()
+    app.MainLoop()
+
+
+if __name__ == '__main__':
+    main()
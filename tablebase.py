@@ -0,0 +1,136 @@
+"""
+    *
+    *   Perfect play tablebase for the tic tac toe machine player.
+    *
+    *   There are only 5478 legal positions, thus all of them are solved once offline and stored in a file of
+    *   3^9 bytes. Each board is indexed in base 3 (see position_index), the cell (i, j) being the digit i * 3 + j:
+    *       --> 0: empty cell.
+    *       --> 1: the machine has its token placed in the cell.
+    *       --> 2: the human has its token placed in the cell.
+    *   The machine is always the one to move, like the root of the search. Each byte stores:
+    *       --> high nibble: the value of the position using the static evaluation scores (1, 2 or 3).
+    *           0 means the position has not been solved and the search must be carried out.
+    *       --> low nibble: the first optimal cell, i * 3 + j, or NO_MOVE if the game is over.
+    *
+    *   Usage: python tablebase.py [path]
+    *
+"""
+import mmap
+import os
+import sys
+import threading
+
+from position_index import masks_to_index, ternary_table
+
+TABLEBASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebase.bin')
+TABLEBASE_SIZE = 3 ** 9
+NO_MOVE = 15
+
+
+def build_tablebase():
+    """
+    It solves every reachable position with the machine to move.
+    :return: a bytearray of 3^9 entries.
+    """
+    from enhanced_machine_player import State
+    data = bytearray(TABLEBASE_SIZE)
+    # (machine_mask, human_mask, machine_turn) --> minmax value
+    solved = {}
+
+    def solve(machine_mask, human_mask, machine_turn):
+        key = (machine_mask, human_mask, machine_turn)
+        if key in solved:
+            return solved[key]
+        state = State.from_masks(machine_mask, human_mask, machine_turn)
+        if state.ending_state():
+            value = state.static_evaluation()
+        else:
+            values = [solve(child.machine_mask, child.human_mask, child.machine_turn)
+                      for child in state.generate_children()]
+            value = max(values) if machine_turn else min(values)
+        solved[key] = value
+        return value
+
+    # every position reachable from the empty board, whoever the first player is.
+    reachable = set()
+    pending = [(0, 0, True), (0, 0, False)]
+    while pending:
+        machine_mask, human_mask, machine_turn = pending.pop()
+        if (machine_mask, human_mask, machine_turn) in reachable:
+            continue
+        reachable.add((machine_mask, human_mask, machine_turn))
+        state = State.from_masks(machine_mask, human_mask, machine_turn)
+        if not state.ending_state():
+            for child in state.generate_children():
+                pending.append((child.machine_mask, child.human_mask, child.machine_turn))
+
+    for machine_mask, human_mask in set((m, h) for m, h, _ in reachable):
+        state = State.from_masks(machine_mask, human_mask, True)
+        if state.ending_state():
+            best_value, best_cell = state.static_evaluation(), NO_MOVE
+        else:
+            best_value, best_cell = -1000, NO_MOVE
+            for child in state.generate_children():
+                value = solve(child.machine_mask, child.human_mask, False)
+                if value > best_value:
+                    # the first optimal cell in row-major order, like the search does.
+                    best_value = value
+                    best_cell = (child.machine_mask ^ machine_mask).bit_length() - 1
+        data[masks_to_index(machine_mask, human_mask)] = best_value << 4 | best_cell
+    return data
+
+
+def write_tablebase(path=TABLEBASE_PATH):
+    data = build_tablebase()
+    with open(path, 'wb') as file:
+        file.write(data)
+    return data
+
+
+class Tablebase:
+    def __init__(self, path=TABLEBASE_PATH):
+        """ :param path: file written by write_tablebase. It's memory mapped, not read into memory. """
+        with open(path, 'rb') as file:
+            self.__data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.__data) != TABLEBASE_SIZE:
+            self.__data.close()
+            raise ValueError(f'{path} is not a tablebase of {TABLEBASE_SIZE} entries')
+        self.__ternary = ternary_table()
+
+    def lookup(self, machine_mask, human_mask):
+        """
+        :return: the tuple (value, cell) of the position with the machine to move, where cell is None if
+            the game is over. None if the position has not been solved.
+        """
+        ternary = self.__ternary
+        entry = self.__data[ternary[machine_mask] + 2 * ternary[human_mask]]
+        if entry == 0:
+            return None
+        cell = entry & 0x0F
+        return entry >> 4, None if cell == NO_MOVE else cell
+
+    def close(self):
+        self.__data.close()
+
+
+_tablebase = None
+_tablebase_loaded = False
+_tablebase_lock = threading.Lock()
+
+
+def load_tablebase():
+    """ It maps the default tablebase file the first time it's needed. None if the file is missing. """
+    global _tablebase, _tablebase_loaded
+    if not _tablebase_loaded:
+        with _tablebase_lock:
+            if not _tablebase_loaded:
+                if os.path.exists(TABLEBASE_PATH):
+                    _tablebase = Tablebase(TABLEBASE_PATH)
+                _tablebase_loaded = True
+    return _tablebase
+
+
+if __name__ == '__main__':
+    output = sys.argv[1] if len(sys.argv) > 1 else TABLEBASE_PATH
+    table = write_tablebase(output)
+    print(f'{sum(1 for entry in table if entry)} positions solved, written to {output}')
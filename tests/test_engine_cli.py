@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from engine_cli import ENGINE_MODULES, parse_board, solve
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('module', sorted(ENGINE_MODULES.values()))
+def test_engine_import_leaves_numpy_out(module):
+    # a fresh interpreter, since the other tests may have imported NumPy already.
+    code = f'import sys; import {module}; print("numpy" in sys.modules)'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=ROOT)
+    assert output.stdout.split() == ['False']
+
+
+def test_parse_board():
+    assert parse_board('o_x/xoo/_x_') == [['o', '_', 'x'], ['x', 'o', 'o'], ['_', 'x', '_']]
+    assert parse_board('o_xxoo_x_') == parse_board('o_x/xoo/_x_')
+    with pytest.raises(ValueError):
+        parse_board('o_x/xo/_x_')
+
+
+def test_legacy_engine_rejects_other_shapes():
+    with pytest.raises(ValueError):
+        list(solve([parse_board('____/____/____/____')], engine='legacy'))
+    assert list(solve([parse_board('oo_/xx_/___')], engine='legacy')) == [(0, 2)]
@@ -0,0 +1,66 @@
+import random
+import tracemalloc
+
+import pytest
+
+from enhanced_machine_player import MachinePlayer
+
+BOARD = [['o', 'x', 'o'],
+         ['_', 'x', '_'],
+         ['x', '_', '_']]
+
+
+def test_memory_stays_flat_over_repeated_calls():
+    # neither the tablebase nor the transposition table answer, so every call searches the tree.
+    player = MachinePlayer(BOARD, 'o', 'x', table=None, use_tablebase=False)
+    # the first calls fill the caches.
+    for _ in range(0, 100):
+        move = player.get_optimal_move()
+    # the machine blocks the column of x.
+    assert move == (2, 1)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for _ in range(0, 10000):
+            assert player.get_optimal_move() == move
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    growth = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    # nothing outlives a call: a list of the states searched would grow by megabytes.
+    assert growth < 64 * 1024, growth
+
+
+def random_positions(count, rows, cols, tokens, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(0, count):
+        board = [['_'] * cols for _ in range(0, rows)]
+        for ply, cell in enumerate(rng.sample(range(0, rows * cols), tokens)):
+            board[cell // cols][cell % cols] = 'x' if ply % 2 == 0 else 'o'
+        positions.append(board)
+    return positions
+
+
+def test_parallel_search_returns_the_serial_move_without_ordering():
+    boards = random_positions(8, 4, 4, 4)
+    options = dict(table=None, rows=4, cols=4, max_depth=3)
+    serial = list(MachinePlayer(None, 'o', 'x', move_ordering=False, **options).get_optimal_moves(boards))
+    ordered = list(MachinePlayer(None, 'o', 'x', **options).get_optimal_moves(boards))
+    with MachinePlayer(None, 'o', 'x', workers=2, **options) as player:
+        parallel = list(player.get_optimal_moves(boards))
+    assert parallel == serial
+    # with move ordering, the movement may be another one of the same value.
+    assert [value for move, value in ordered] == [value for move, value in parallel]
+
+
+def test_batch_numpy_input_matches_lists():
+    numpy = pytest.importorskip('numpy')
+    boards = random_positions(40, 3, 3, 4, seed=1) + random_positions(40, 3, 3, 2, seed=2)
+    player = MachinePlayer(None, 'o', 'x')
+    expected = list(player.get_optimal_moves(boards))
+    assert list(player.get_optimal_moves(numpy.array(boards), chunk_size=16)) == expected
+    # the same positions, searched without the tablebase.
+    searched = MachinePlayer(None, 'o', 'x', use_tablebase=False)
+    assert [value for move, value in searched.get_optimal_moves(numpy.array(boards))] == \
+        [value for move, value in expected]
@@ -0,0 +1,30 @@
+from move_log import LogWriter, MoveLog, read_log
+from protocol import MOVE, encode_move
+
+
+def write_game(path, moves):
+    writer = LogWriter(path)
+    log = MoveLog(1, writer=writer)
+    for seat, (i, j) in enumerate(moves):
+        log.append(seat % 2, MOVE, encode_move(i, j, True)[3:])
+    writer.close()
+    return writer.run
+
+
+def test_games_of_different_runs_are_told_apart(tmp_path):
+    path = tmp_path / 'moves.log'
+    # both runs number their first game 1.
+    first = write_game(path, [(0, 0), (1, 1)])
+    second = write_game(path, [(2, 2)])
+    assert first != second
+    assert [record[0] for record in read_log(path, game=1)] == [first, first, second]
+    assert [(run, game, seat) for run, game, seat, kind, payload in read_log(path, game=1, run=second)] \
+        == [(second, 1, 0)]
+
+
+def test_ring_buffer_keeps_the_latest_messages():
+    log = MoveLog(1, capacity=2)
+    for seat in range(0, 5):
+        log.append(seat, MOVE, b'\x00')
+    assert [seat for seat, kind, payload in log] == [3, 4]
+    assert log.total == 5 and log.dropped == 3
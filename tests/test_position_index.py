@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from position_index import (batch_board_masks, batch_board_to_index, batch_index_to_masks, batch_masks_to_index,
+                            board_masks, board_to_index, canonical_index, index_count, index_to_board,
+                            index_to_masks, masks_to_index, symmetry_cells, symmetry_tables, transform_mask)
+
+
+def random_boards(count, rows=3, cols=3, seed=0):
+    rng = random.Random(seed)
+    return [[[rng.choice('ox_') for _ in range(0, cols)] for _ in range(0, rows)] for _ in range(0, count)]
+
+
+def test_index_round_trip():
+    for index in range(0, index_count()):
+        board = index_to_board(index, 'o', 'x')
+        assert board_to_index(board, 'o', 'x') == index
+        assert masks_to_index(*index_to_masks(index)) == index
+
+
+def test_canonical_index_is_shared_by_symmetric_boards():
+    for machine_mask, human_mask in ((0b1, 0b10), (0b100000011, 0b1000), (0b10000, 0b101)):
+        indexes = {canonical_index(transform_mask(machine_mask, destination), transform_mask(human_mask, destination))
+                   for destination in symmetry_cells(3, 3)}
+        assert len(indexes) == 1
+
+
+def test_symmetry_tables_follow_symmetry_cells():
+    for table, destination in zip(symmetry_tables(), symmetry_cells(3, 3)):
+        assert all(table[mask] == transform_mask(mask, destination) for mask in range(0, 1 << 9))
+
+
+def test_batch_lists_match_scalars():
+    boards = random_boards(50)
+    machine_masks, human_masks = batch_board_masks(boards, 'o', 'x')
+    assert list(zip(machine_masks, human_masks)) == [board_masks(board, 'o', 'x') for board in boards]
+    indexes = batch_board_to_index(boards, 'o', 'x')
+    assert indexes == batch_masks_to_index(machine_masks, human_masks)
+    assert batch_index_to_masks(indexes) == (machine_masks, human_masks)
+
+
+@pytest.mark.parametrize('rows, cols', [(3, 3), (4, 4), (5, 7), (3, 13)])
+def test_batch_numpy_matches_lists(rows, cols):
+    numpy = pytest.importorskip('numpy')
+    boards = random_boards(50, rows, cols)
+    array = numpy.array(boards)
+    machine_masks, human_masks = batch_board_masks(array, 'o', 'x')
+    assert isinstance(machine_masks, numpy.ndarray)
+    assert (machine_masks.tolist(), human_masks.tolist()) == batch_board_masks(boards, 'o', 'x')
+    indexes = batch_board_to_index(array, 'o', 'x')
+    assert indexes.tolist() == batch_board_to_index(boards, 'o', 'x')
+    assert batch_masks_to_index(machine_masks, human_masks, rows, cols).tolist() == indexes.tolist()
+    machine_back, human_back = batch_index_to_masks(indexes, rows, cols)
+    assert machine_back.tolist() == machine_masks.tolist() and human_back.tolist() == human_masks.tolist()
+
+
+def test_batch_numpy_rejects_indexes_beyond_int64():
+    numpy = pytest.importorskip('numpy')
+    # 3 ** 40 - 1 does not fit in an int64.
+    boards = numpy.array([[['x'] * 8 for _ in range(0, 5)]])
+    with pytest.raises(ValueError):
+        batch_board_to_index(boards, 'o', 'x')
+    # 39 cells do.
+    boards = numpy.array([[['x'] * 13 for _ in range(0, 3)]])
+    assert batch_board_to_index(boards, 'o', 'x').tolist() == [board_to_index(boards[0].tolist(), 'o', 'x')]
+
+
+def test_batch_numpy_rejects_masks_beyond_int64():
+    numpy = pytest.importorskip('numpy')
+    boards = numpy.array([[['x'] * 8 for _ in range(0, 8)]])
+    with pytest.raises(ValueError):
+        batch_board_masks(boards, 'o', 'x')
+    boards = numpy.array([[['x'] * 9 for _ in range(0, 7)]])
+    assert batch_board_masks(boards, 'o', 'x')[1].tolist() == [(1 << 63) - 1]
@@ -0,0 +1,31 @@
+import pytest
+
+from protocol import (DISCONNECT, MOVE, TEXT, FrameReader, ProtocolError, decode_move, encode_disconnect,
+                      encode_frame, encode_move, encode_text, fuzz)
+
+
+def test_frames_split_anywhere_are_read_back():
+    stream = encode_move(1, 2, True) + encode_text('hi') + encode_disconnect()
+    reader = FrameReader()
+    frames = []
+    for byte in stream:
+        frames += reader.feed(bytes((byte,)))
+    assert frames == [(MOVE, bytes((5 | 0x80,))), (TEXT, b'hi'), (DISCONNECT, b'')]
+    assert decode_move(frames[0][1]) == (1, 2, True)
+
+
+@pytest.mark.parametrize('frame', [b'\x00\x02\x01ab', b'\x00\x00\x01', b'\x00\x01\x02x', b'\x00\x01\x03\xff'])
+def test_payload_not_suiting_its_type_is_rejected(frame):
+    with pytest.raises(ProtocolError):
+        FrameReader().feed(frame)
+
+
+def test_encoder_rejects_what_the_reader_rejects():
+    with pytest.raises(ProtocolError):
+        encode_frame(MOVE, b'ab')
+    with pytest.raises(ProtocolError):
+        encode_frame(DISCONNECT, b'x')
+
+
+def test_fuzz():
+    assert fuzz(200) > 0
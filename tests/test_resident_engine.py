@@ -0,0 +1,49 @@
+import io
+
+from resident_engine import run
+
+
+def answers(commands):
+    output = io.StringIO()
+    run(io.StringIO(''.join(line + '\n' for line in commands)), output)
+    return output.getvalue().splitlines()
+
+
+def test_position_go_bestmove():
+    lines = answers(['position startpos', 'go'])
+    assert not any(line.startswith('info string error') for line in lines), lines
+    assert lines[-1].startswith('bestmove ')
+    i, j = map(int, lines[-1].split()[1:])
+    assert 0 <= i < 3 and 0 <= j < 3
+
+
+def test_go_takes_the_winning_move():
+    # the machine (o) completes the first row.
+    lines = answers(['position oo_/xx_/___', 'go depth 9'])
+    assert lines[-1] == 'bestmove 0 2'
+
+
+def test_go_on_finished_game():
+    lines = answers(['position ooo/xx_/___', 'go'])
+    assert lines[-1] == 'bestmove none'
+
+
+def test_pipelined_queries_answer_in_order():
+    lines = answers(['position startpos', 'go movetime 50', 'position oo_/xx_/___', 'go depth 2'])
+    bestmoves = [line for line in lines if line.startswith('bestmove')]
+    assert len(bestmoves) == 2
+    assert bestmoves[1] == 'bestmove 0 2'
+
+
+def test_go_depth_searches_instead_of_the_tablebase():
+    lines = answers(['position startpos', 'go depth 1'])
+    info = lines[-2].split()
+    assert info[info.index('depth') + 1] == '1'
+    assert info[info.index('tbhits') + 1] == '0'
+    assert lines[-1].startswith('bestmove ')
+
+
+def test_go_infinite_answers_after_stop():
+    lines = answers(['position startpos', 'go infinite', 'isready', 'stop'])
+    assert lines[0] == 'readyok'
+    assert lines[-1].startswith('bestmove ')
@@ -0,0 +1,47 @@
+import random
+
+from enhanced_machine_player import State, get_geometry, search_root
+from search_core import SearchCore
+from win_detection import board_status, is_winning_move
+
+
+def random_positions(count, rows, cols, win_length, placed, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        masks = [0, 0]
+        for ply, cell in enumerate(rng.sample(range(0, rows * cols), placed)):
+            masks[ply % 2] |= 1 << cell
+        if not board_status(masks, rows, cols, win_length)[0]:
+            # the machine moves second, so it's the one to move.
+            positions.append((masks[1], masks[0]))
+    return positions
+
+
+def test_is_winning_move_agrees_with_the_full_check():
+    rng = random.Random(0)
+    for _ in range(0, 2000):
+        cell = rng.randrange(0, 16)
+        before = rng.getrandbits(16) & ~(1 << cell)
+        if board_status([before], 4, 4, 3)[1] == 0:
+            # the player had already won before the movement.
+            continue
+        after = before | 1 << cell
+        assert is_winning_move(after, cell, 4, 4, 3) == (board_status([after], 4, 4, 3)[1] == 0)
+
+
+def test_core_matches_the_state_search_on_boards_without_win_table():
+    geometry = get_geometry(4, 4, 3)
+    for machine_mask, human_mask in random_positions(10, 4, 4, 3, 8):
+        depth = 16 - 8
+        value, cell, completed = SearchCore(geometry).search_root(machine_mask, human_mask, depth)
+        root = State.from_masks(machine_mask, human_mask, True, geometry=geometry)
+        state_value, child, _ = search_root(root, depth)
+        assert completed
+        assert (value, cell) == (state_value, (child.machine_mask ^ machine_mask).bit_length() - 1)
+
+
+def test_core_root_already_over():
+    geometry = get_geometry(3, 3, 3)
+    # the human has the first row.
+    assert SearchCore(geometry).search_root(0b11000, 0b111, 4) == (1, None, True)
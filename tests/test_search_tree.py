@@ -0,0 +1,26 @@
+from search_tree import RootNode, build_tree
+
+
+def test_depth_limit_leaves_are_unexpanded():
+    root = RootNode(0, 0, True)
+    assert build_tree(root, 1) == 10
+    for child in root.children:
+        assert child.children is None
+        assert len(child.expand()) == 8
+
+
+def test_tree_is_deepened_by_a_later_build():
+    root = RootNode(0, 0, True)
+    build_tree(root, 1)
+    assert build_tree(root, 2) == 1 + 9 + 9 * 8
+    # the whole tree: the empty board is a tie.
+    build_tree(root)
+    assert root.value == 2
+
+
+def test_game_over_nodes_have_no_children():
+    # the machine has the first row.
+    root = RootNode(0b111, 0b11000, False)
+    assert build_tree(root) == 1
+    assert root.children == ()
+    assert root.expand() == ()
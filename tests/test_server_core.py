@@ -0,0 +1,57 @@
+import socket
+import threading
+
+import pytest
+
+from protocol import MOVE, FrameReader, encode_move
+from server_core import GameServer
+
+
+@pytest.fixture
+def server():
+    # no logging at all, so describe is not run on the messages, as at the INFO level of the daemon.
+    server = GameServer('127.0.0.1', 0, log=None)
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.stop()
+    thread.join(5)
+
+
+def connect(server):
+    sock = socket.create_connection(server.address)
+    sock.settimeout(5)
+    return sock
+
+
+def receive_frames(sock, count):
+    reader = FrameReader()
+    frames = []
+    while len(frames) < count:
+        data = sock.recv(4096)
+        if not data:
+            break
+        frames += reader.feed(data)
+    return frames
+
+
+def test_move_is_relayed_to_the_room(server):
+    first, second = connect(server), connect(server)
+    first.sendall(encode_move(1, 2, True))
+    assert receive_frames(second, 1) == [(MOVE, encode_move(1, 2, True)[3:])]
+    first.close()
+    second.close()
+
+
+def test_malformed_move_is_not_relayed(server):
+    first, second = connect(server), connect(server)
+    # a MOVE frame with a 2-byte payload.
+    first.sendall(b'\x00\x02\x01ab')
+    # the sender is dropped.
+    assert first.recv(4096) == b''
+    # the first frame the peer gets is the echo of its own movement.
+    second.sendall(encode_move(0, 0, True))
+    assert receive_frames(second, 1) == [(MOVE, encode_move(0, 0, True)[3:])]
+    first.close()
+    second.close()
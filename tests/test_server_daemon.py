@@ -0,0 +1,23 @@
+import io
+import os
+import signal
+import threading
+
+from server_core import GameServer, logger
+from server_daemon import configure_logging, serve
+
+
+def test_signal_shuts_down_and_is_logged_after_the_loop():
+    stream = io.StringIO()
+    handler = configure_logging(stream=stream)
+    try:
+        server = GameServer('127.0.0.1', 0)
+        server.start()
+        threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGTERM)).start()
+        serve(server, shutdown_timeout=1)
+    finally:
+        logger.removeHandler(handler)
+    events = [line.split()[3] for line in stream.getvalue().splitlines()]
+    assert events[-3:] == ['shutting_down', 'closed', 'signal']
+    assert 'name=SIGTERM' in stream.getvalue().splitlines()[-1]
+    assert not server.running
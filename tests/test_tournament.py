@@ -0,0 +1,60 @@
+import pytest
+
+import tournament
+
+
+class FirstEmptyCell:
+    def __init__(self, board, machine, human, win_length, seed):
+        self.board = board
+
+    def get_optimal_move(self):
+        for i, row in enumerate(self.board):
+            for j, token in enumerate(row):
+                if token == '_':
+                    return i, j
+        return None
+
+
+def first_empty_cell(board, machine, human, win_length, seed):
+    return FirstEmptyCell(board, machine, human, win_length, seed)
+
+
+@pytest.fixture
+def registered_engine():
+    tournament.register_engine('first_empty_cell', first_empty_cell)
+    yield 'first_empty_cell'
+    del tournament.ENGINES['first_empty_cell']
+
+
+def test_enhanced_never_loses(registered_engine):
+    # without random openings, neither side starts from a lost position.
+    table, latencies, played, seconds = tournament.run(['enhanced', registered_engine], games=10, opening_plies=0)
+    assert played == 10
+    assert table[('enhanced', registered_engine)][2] == 0
+
+
+def test_engine_registered_at_runtime_plays_in_spawned_workers(registered_engine):
+    # the spawned processes import tournament again, without the engine registered here.
+    table, latencies, played, seconds = tournament.run(['enhanced', registered_engine], games=4, workers=2,
+                                                       start_method='spawn')
+    assert played == 4
+    assert sum(table[(registered_engine, 'enhanced')]) == 4
+
+
+def test_pool_is_shut_down_on_failure(registered_engine, monkeypatch):
+    shutdowns = []
+
+    class Executor:
+        def __init__(self, max_workers, mp_context):
+            pass
+
+        def map(self, function, *iterables):
+            raise RuntimeError('the tournament failed')
+
+        def shutdown(self, cancel_futures=False):
+            shutdowns.append(cancel_futures)
+
+    monkeypatch.setattr('concurrent.futures.ProcessPoolExecutor', Executor)
+    with pytest.raises(RuntimeError):
+        tournament.run(['enhanced', registered_engine], games=2, workers=2)
+    assert shutdowns == [True]
@@ -0,0 +1,22 @@
+from enhanced_machine_player import MachinePlayer
+from transposition_table import EXACT, TranspositionTable
+
+
+def test_best_move_outlives_the_depth():
+    table = TranspositionTable()
+    table.store('key', 2.5, EXACT, 2, 1 << 4)
+    # too shallow to answer a deeper probe, the movement is still handed out.
+    assert table.probe('key', 4) is None
+    assert table.best_move('key') == 1 << 4
+    assert table.best_move('missing') is None
+
+
+def test_search_stores_the_best_moves():
+    table = TranspositionTable()
+    board = [['_'] * 5 for _ in range(0, 5)]
+    board[2][2] = 'x'
+    with MachinePlayer(board, 'o', 'x', table=table, rows=5, cols=5, win_length=4, max_depth=3) as player:
+        player.get_optimal_move()
+    # every child of the root is searched, the human's reply included.
+    key = player.geometry.key(1 << 6, 1 << 12, False)
+    assert table.best_move(key) is not None
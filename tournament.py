@@ -0,0 +1,294 @@
+"""
+    *
+    *   Headless tournament runner: the machine players play each other, without any GUI nor human.
+    *
+    *   Every pair of engines plays the given number of games from randomized openings: a few random plies are
+    *   played before the engines take over, and each opening is played twice so both engines move first once.
+    *   The games are spread over a process pool. It reports a win / draw / loss table, the average latency of
+    *   the movements of each engine and the games per second.
+    *
+    *   The game records are written to a text file, one game per line, so it can be streamed back:
+    *       first engine <tab> second engine <tab> result <tab> rows x cols x win length <tab> opening plies
+    *       <tab> movements
+    *   where the result is 1 if the first engine won, 2 if the second one did and = for a tie, and each
+    *   movement is a single character of RECORD_ALPHABET: the one at the index i * cols + j of the cell. The
+    *   file is compressed with gzip if its name ends with .gz.
+    *
+    *   Usage: python tournament.py [--engines legacy enhanced mcts] [--games 100] [--workers 4]
+    *                               [--records games.txt.gz]
+    *          python tournament.py --replay games.txt.gz
+    *
+"""
+import argparse
+import gzip
+import itertools
+import random
+import sys
+import time
+from collections import namedtuple
+
+FIRST_TOKEN = 'x'
+SECOND_TOKEN = 'o'
+# one character per cell, thus the records support boards of up to 64 cells.
+RECORD_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+DEFAULT_OPENING_PLIES = 2
+# Games handed to a process at a time.
+GAMES_PER_TASK = 16
+
+GameRecord = namedtuple('GameRecord', 'first second result rows cols win_length opening moves')
+
+
+def _legacy(board, machine, human, win_length, seed):
+    from machine_player import MachinePlayer
+    if len(board) != 3 or len(board[0]) != 3 or win_length != 3:
+        raise ValueError('the legacy machine player only plays the 3 x 3 board')
+    return MachinePlayer(board, machine, human)
+
+
+def _enhanced(board, machine, human, win_length, seed):
+    from enhanced_machine_player import MachinePlayer
+    return MachinePlayer(board, machine, human, win_length=win_length)
+
+
+def _enhanced_search(board, machine, human, win_length, seed):
+    from enhanced_machine_player import MachinePlayer
+    return MachinePlayer(board, machine, human, win_length=win_length, use_tablebase=False)
+
+
+def _mcts(board, machine, human, win_length, seed):
+    from enhanced_machine_player import MCTS, MachinePlayer
+    return MachinePlayer(board, machine, human, win_length=win_length, backend=MCTS, seed=seed)
+
+
+# engine name --> factory(board, machine token, human token, win length, seed) of a player with a
+# get_optimal_move method.
+ENGINES = {
+    'legacy': _legacy,
+    'enhanced': _enhanced,
+    'enhanced_search': _enhanced_search,
+    'mcts': _mcts,
+}
+
+
+def register_engine(name, factory):
+    """
+    It makes a new backend available to the tournaments. The factory is handed to the processes of the pool
+    along with the games, so it must be picklable, that is, defined at the top level of a module.
+    :param factory: callable(board, machine token, human token, win length, seed) returning a player.
+    """
+    ENGINES[name] = factory
+
+
+def random_opening(rng, rows, cols, win_length, plies):
+    """ Random cells played alternately from the empty board. The game is not over after them. """
+    from win_detection import board_status
+    while True:
+        cells = rng.sample(range(0, rows * cols), plies)
+        masks = [0, 0]
+        for ply, cell in enumerate(cells):
+            masks[ply % 2] |= 1 << cell
+        if not board_status(masks, rows, cols, win_length)[0]:
+            return cells
+
+
+def play_game(first, second, rows, cols, win_length, opening, seed, engines=None):
+    """
+    :param opening: cells played before the engines take over, starting with the first engine's token.
+    :return: the tuple (record, latencies) where latencies maps each engine to the list of seconds its
+        movements took.
+    """
+    from win_detection import check_board
+    engines = ENGINES if engines is None else engines
+    board = [['_' for _ in range(0, cols)] for _ in range(0, rows)]
+    moves = list(opening)
+    for ply, cell in enumerate(opening):
+        board[cell // cols][cell % cols] = FIRST_TOKEN if ply % 2 == 0 else SECOND_TOKEN
+    players = ((first, FIRST_TOKEN, SECOND_TOKEN), (second, SECOND_TOKEN, FIRST_TOKEN))
+    latencies = {first: [], second: []}
+    ply = len(opening)
+    while True:
+        game_over, winner = check_board(board, (FIRST_TOKEN, SECOND_TOKEN), win_length)
+        if game_over:
+            break
+        name, machine, human = players[ply % 2]
+        player = engines[name](board, machine, human, win_length, seed + ply)
+        start = time.perf_counter()
+        move = player.get_optimal_move()
+        latencies[name].append(time.perf_counter() - start)
+        if move is None:
+            break
+        board[move[0]][move[1]] = machine
+        moves.append(move[0] * cols + move[1])
+        ply += 1
+    result = '1' if winner == FIRST_TOKEN else '2' if winner == SECOND_TOKEN else '='
+    return GameRecord(first, second, result, rows, cols, win_length, len(opening), tuple(moves)), latencies
+
+
+def _play_games(games, engines):
+    """
+    The games handed to a process of the pool, as (first, second, rows, cols, win_length, opening, seed).
+    :param engines: engine name --> factory of the engines playing. The processes started with spawn import
+        the module again, so the engines registered at runtime are only known through it.
+    """
+    return [play_game(*game, engines=engines) for game in games]
+
+
+def schedule(engines, games, rows, cols, win_length, opening_plies, seed):
+    """
+    :return: the list of games to be played. Each pair of engines plays games games, every opening twice
+        with the engines swapping sides.
+    """
+    rng = random.Random(seed)
+    scheduled = []
+    for first, second in itertools.combinations(engines, 2):
+        for game in range(0, games, 2):
+            opening = random_opening(rng, rows, cols, win_length, opening_plies)
+            game_seed = rng.getrandbits(32)
+            scheduled.append((first, second, rows, cols, win_length, opening, game_seed))
+            if game + 1 < games:
+                scheduled.append((second, first, rows, cols, win_length, opening, game_seed))
+    return scheduled
+
+
+def run(engines, games=100, rows=3, cols=3, win_length=3, opening_plies=DEFAULT_OPENING_PLIES, seed=0,
+        workers=1, records=None, start_method=None):
+    """
+    :param records: path of the file the game records are written to, None to drop them.
+    :param start_method: multiprocessing start method of the pool, fork, spawn or forkserver. None uses the
+        default one of the platform.
+    :return: the tuple (table, latencies, games played, seconds) where table maps (engine, opponent) to the
+        [wins, draws, losses] of the engine, and latencies maps each engine to (movements, total seconds).
+    """
+    for name in engines:
+        if name not in ENGINES:
+            raise ValueError(f'unknown engine {name}, expected one of {", ".join(ENGINES)}')
+    factories = {name: ENGINES[name] for name in engines}
+    scheduled = schedule(engines, games, rows, cols, win_length, opening_plies, seed)
+    tasks = [scheduled[start:start + GAMES_PER_TASK] for start in range(0, len(scheduled), GAMES_PER_TASK)]
+    table = {}
+    latencies = {name: [0, 0.0] for name in engines}
+    played = 0
+    start = time.perf_counter()
+    output = open_records(records, 'w') if records is not None else None
+    executor = None
+    try:
+        if workers > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            context = None if start_method is None else multiprocessing.get_context(start_method)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            results = executor.map(_play_games, tasks, itertools.repeat(factories))
+        else:
+            results = map(_play_games, tasks, itertools.repeat(factories))
+        for task_results in results:
+            for record, game_latencies in task_results:
+                played += 1
+                _score(table, record)
+                for name, seconds in game_latencies.items():
+                    latencies[name][0] += len(seconds)
+                    latencies[name][1] += sum(seconds)
+                if output is not None:
+                    output.write(format_record(record) + '\n')
+    finally:
+        if executor is not None:
+            # the games not started yet are dropped if the tournament has failed.
+            executor.shutdown(cancel_futures=True)
+        if output is not None:
+            output.close()
+    return table, {name: tuple(value) for name, value in latencies.items()}, played, time.perf_counter() - start
+
+
+def _score(table, record):
+    first = table.setdefault((record.first, record.second), [0, 0, 0])
+    second = table.setdefault((record.second, record.first), [0, 0, 0])
+    if record.result == '1':
+        first[0] += 1
+        second[2] += 1
+    elif record.result == '2':
+        first[2] += 1
+        second[0] += 1
+    else:
+        first[1] += 1
+        second[1] += 1
+
+
+def open_records(path, mode='r'):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='ascii')
+    return open(path, mode, encoding='ascii')
+
+
+def format_record(record):
+    moves = ''.join(RECORD_ALPHABET[cell] for cell in record.moves)
+    return f'{record.first}\t{record.second}\t{record.result}\t{record.rows}x{record.cols}x{record.win_length}\t' \
+           f'{record.opening}\t{moves}'
+
+
+def parse_record(line):
+    first, second, result, shape, opening, moves = line.rstrip('\n').split('\t')
+    rows, cols, win_length = (int(value) for value in shape.split('x'))
+    return GameRecord(first, second, result, rows, cols, win_length, int(opening),
+                      tuple(RECORD_ALPHABET.index(move) for move in moves))
+
+
+def read_records(path):
+    """ A generator of the GameRecord written to the file, read one line at a time. """
+    with open_records(path) as file:
+        for line in file:
+            if line.strip():
+                yield parse_record(line)
+
+
+def format_table(table, engines):
+    width = max(len(name) for name in engines) + 2
+    lines = [' ' * width + ''.join(f'{name:>{width + 6}}' for name in engines)]
+    for name in engines:
+        cells = []
+        for opponent in engines:
+            if name == opponent:
+                cells.append(f'{"-":>{width + 6}}')
+            else:
+                wins, draws, losses = table.get((name, opponent), (0, 0, 0))
+                cells.append(f'{f"{wins}/{draws}/{losses}":>{width + 6}}')
+        lines.append(f'{name:<{width}}' + ''.join(cells))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tournament between the machine players.')
+    parser.add_argument('--engines', nargs='+', default=['legacy', 'enhanced', 'mcts'])
+    parser.add_argument('--games', type=int, default=100, help='games played by each pair of engines')
+    parser.add_argument('--rows', type=int, default=3)
+    parser.add_argument('--cols', type=int, default=3)
+    parser.add_argument('--win-length', type=int, default=3)
+    parser.add_argument('--opening-plies', type=int, default=DEFAULT_OPENING_PLIES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--records', help='file the game records are written to, gzip if it ends with .gz')
+    parser.add_argument('--replay', help='it reads a records file back and prints its table')
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        table = {}
+        engines = []
+        for record in read_records(args.replay):
+            _score(table, record)
+            for name in (record.first, record.second):
+                if name not in engines:
+                    engines.append(name)
+        print(format_table(table, engines))
+        return 0
+
+    table, latencies, played, seconds = run(args.engines, args.games, args.rows, args.cols, args.win_length,
+                                            args.opening_plies, args.seed, args.workers, args.records)
+    print('wins/draws/losses of the row engine against the column one')
+    print(format_table(table, args.engines))
+    print()
+    for name, (moves, total) in latencies.items():
+        print(f'{name}: {moves} movements, {total / moves * 1000 if moves else 0:.3f} ms on average')
+    print(f'{played} games in {seconds:.2f} s, {played / seconds:.1f} games/s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+    *
+    *   Transposition table shared by both tic tac toe machine players.
+    *
+    *   The same position may be reached through different move orders and, besides, the 8 rotations and
+    *   reflections of a board (the D4 symmetries of the square) are worth exactly the same. Every position is
+    *   therefore stored under a canonical key: the minimum key over its 8 symmetric boards.
+    *
+    *   The boards are handled as a pair of 9-bit masks (machine, human) where the bit i * 3 + j stands for the
+    *   cell (i, j). Since the alpha-beta-pruning does not always compute the exact value of a node, each entry
+    *   is flagged as:
+    *       --> EXACT: the value is the minmax value of the node.
+    *       --> LOWER_BOUND: the search failed high, the real value is greater or equal than the stored one.
+    *       --> UPPER_BOUND: the search failed low, the real value is lower or equal than the stored one.
+    *   Each entry also keeps the best movement found, if any. Even an entry too shallow to answer a probe points
+    *   at the movement worth searching first, such as the next search of the same game two plies deeper.
+    *
+    *   The symmetry tables are only built the first time a key is worked out, so importing the module is cheap.
+    *
+"""
+import threading
+from collections import OrderedDict
+
+from position_index import symmetry_cells, symmetry_tables
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+DEFAULT_MAX_ENTRIES = 100000
+
+
+# For each of the 8 symmetries, the cell every cell goes to. symmetry_tables follows the same order.
+SYMMETRY_CELLS = symmetry_cells(3, 3)
+# For each symmetry, the cell every cell comes from. It undoes the symmetry.
+INVERSE_SYMMETRY_CELLS = tuple(tuple(destination.index(cell) for cell in range(0, 9))
+                               for destination in SYMMETRY_CELLS)
+
+
+def __getattr__(name):
+    # SYMMETRY_TABLES is still importable, though it gets built on demand.
+    if name == 'SYMMETRY_TABLES':
+        return symmetry_tables()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def canonical_key(machine_mask, human_mask, machine_turn, rows=3, cols=3, win_length=3):
+    """
+    :param machine_mask: cells the machine has a token placed in.
+    :param human_mask: cells the human has a token placed in.
+    :param machine_turn: whether the machine is the next one to move.
+    :return: the smallest key among the 8 symmetric boards, the turn is kept in the lowest bit.
+        The symmetries are only worked out for the 3 x 3 board. Any other board is keyed on its shape
+        and both masks, so positions of different boards never collide.
+    """
+    if rows != 3 or cols != 3 or win_length != 3:
+        return rows, cols, win_length, machine_mask, human_mask, machine_turn
+    best = None
+    for table in symmetry_tables():
+        key = table[machine_mask] << 9 | table[human_mask]
+        if best is None or key < best:
+            best = key
+    return best << 1 | (1 if machine_turn else 0)
+
+
+def canonical_symmetry(machine_mask, human_mask):
+    """ It returns the index of the symmetry which turns the board into its canonical one. """
+    best = None
+    best_symmetry = 0
+    for symmetry, table in enumerate(symmetry_tables()):
+        key = table[machine_mask] << 9 | table[human_mask]
+        if best is None or key < best:
+            best = key
+            best_symmetry = symmetry
+    return best_symmetry
+
+
+class TranspositionTable:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        """ :param max_entries: maximum number of positions kept. Once it's reached, the least recently
+                used entry gets evicted.
+        """
+        if max_entries < 1:
+            raise ValueError('max_entries must be a positive number')
+        self.__max_entries = max_entries
+        # key --> (value, flag, depth, best movement)
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__probes = 0
+        self.__hits = 0
+        self.__evictions = 0
+
+    @property
+    def max_entries(self):
+        return self.__max_entries
+
+    @property
+    def probes(self):
+        return self.__probes
+
+    @property
+    def hits(self):
+        return self.__hits
+
+    @property
+    def evictions(self):
+        return self.__evictions
+
+    @property
+    def hit_rate(self):
+        """ Ratio of probes which found a stored entry. """
+        if self.__probes == 0:
+            return 0.0
+        return self.__hits / self.__probes
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def probe(self, key, depth):
+        """
+        :param key: canonical key of the position.
+        :param depth: remaining depth the caller is going to search.
+        :return: the tuple (value, flag) if an entry searched at least as deep is stored, otherwise None.
+        """
+        with self.__lock:
+            self.__probes += 1
+            entry = self.__entries.get(key)
+            if entry is None or entry[2] < depth:
+                return None
+            self.__hits += 1
+            self.__entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def best_move(self, key):
+        """ It returns the best movement stored for the position whatever depth it was searched to, or None. """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            return None if entry is None else entry[3]
+
+    def store(self, key, value, flag, depth, move=None):
+        """ :param move: the best movement found, as the caller encodes it: the bit of the cell, for instance. """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                # keep the deepest result of the position
+                if entry[2] > depth:
+                    return
+                self.__entries.move_to_end(key)
+            elif len(self.__entries) >= self.__max_entries:
+                # evict the least recently used position
+                self.__entries.popitem(last=False)
+                self.__evictions += 1
+            self.__entries[key] = (value, flag, depth, move)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__probes = 0
+            self.__hits = 0
+            self.__evictions = 0
+
+    def stats(self):
+        """ It returns a summary of the table usage. """
+        return {'entries': len(self.__entries), 'max_entries': self.__max_entries, 'probes': self.__probes,
+                'hits': self.__hits, 'hit_rate': self.hit_rate, 'evictions': self.__evictions}
+
+
+def lookup(table, key, depth, alpha, beta):
+    """
+    It probes the table and returns the entry (value, flag) only if it's enough to answer the node searched
+    within the window (alpha, beta). Otherwise, it returns None and the node must be searched.
+    """
+    entry = table.probe(key, depth)
+    if entry is None:
+        return None
+    value, flag = entry
+    if flag == EXACT or (flag == LOWER_BOUND and value >= beta) or (flag == UPPER_BOUND and value <= alpha):
+        return entry
+    return None
+
+
+def store_result(table, key, value, alpha, beta, depth, move=None):
+    """ It stores a search result flagging it according to the window it has been searched with. """
+    if value <= alpha:
+        table.store(key, value, UPPER_BOUND, depth, move)
+    elif value >= beta:
+        table.store(key, value, LOWER_BOUND, depth, move)
+    else:
+        table.store(key, value, EXACT, depth, move)
+
+
+# table shared by every machine player which is not given its own one.
+default_table = TranspositionTable()
@@ -0,0 +1,127 @@
+"""
+    *
+    *   Win detection shared by the machine players and the GUI clients.
+    *
+    *   A board of rows x cols cells is handled as one integer mask per player, where the bit i * cols + j is set
+    *   whenever the player has a token placed in the cell (i, j). Every winning line (win_length cells in a row,
+    *   a column or a diagonal) is worked out once per board shape and kept as a mask too. Thus, a player has won
+    *   when any line mask is fully contained in its own mask.
+    *
+    *   For a 3 x 3 board with a win length of 3 the 8 lines are the 3 rows, the 3 cols and both diagonals.
+    *
+"""
+from functools import lru_cache
+
+from position_index import board_masks, is_ndarray
+
+# the four directions a line may follow: row, col, main diagonal and secondary diagonal.
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+@lru_cache(maxsize=None)
+def line_masks(rows=3, cols=3, win_length=3):
+    """ It returns the masks of all the winning lines of the board. """
+    if win_length < 1 or (win_length > rows and win_length > cols):
+        raise ValueError(f'a win length of {win_length} does not fit in a {rows} x {cols} board')
+    lines = []
+    for i in range(0, rows):
+        for j in range(0, cols):
+            for delta_i, delta_j in DIRECTIONS:
+                end_i = i + delta_i * (win_length - 1)
+                end_j = j + delta_j * (win_length - 1)
+                if 0 <= end_i < rows and 0 <= end_j < cols:
+                    mask = 0
+                    for step in range(0, win_length):
+                        mask |= 1 << ((i + delta_i * step) * cols + j + delta_j * step)
+                    lines.append(mask)
+    # with a win length of 1 the same cell is found in every direction, so the repeated lines are dropped.
+    return tuple(dict.fromkeys(lines))
+
+
+@lru_cache(maxsize=None)
+def cell_line_masks(rows=3, cols=3, win_length=3):
+    """ For each cell, the masks of the winning lines which go through it. """
+    lines = line_masks(rows, cols, win_length)
+    return tuple(tuple(line for line in lines if line >> cell & 1) for cell in range(0, rows * cols))
+
+
+@lru_cache(maxsize=None)
+def winning_mask_table(rows=3, cols=3, win_length=3):
+    """
+    It tells, for every possible mask, whether it contains a winning line. It takes 2^(rows * cols) entries,
+    so it's only meant for small boards such as the 3 x 3 one, where a win check becomes a single lookup.
+    """
+    lines = line_masks(rows, cols, win_length)
+    return tuple(any(mask & line == line for line in lines) for mask in range(0, 1 << (rows * cols)))
+
+
+def board_status(player_masks, rows=3, cols=3, win_length=3):
+    """
+    It checks the board in a single pass over the winning lines.
+    :param player_masks: sequence with the mask of each player.
+    :return: the tuple (game_over, winner) where winner is the index of the player within player_masks,
+        or None if nobody has won yet.
+    """
+    for line in line_masks(rows, cols, win_length):
+        for player, mask in enumerate(player_masks):
+            if mask & line == line:
+                return True, player
+    occupied = 0
+    for mask in player_masks:
+        occupied |= mask
+    return occupied == (1 << (rows * cols)) - 1, None
+
+
+def is_winning_move(player_mask, cell, rows=3, cols=3, win_length=3):
+    """
+    It checks whether the token just placed in the cell has made the player win. Only the lines that go
+    through the cell are looked at.
+    :param player_mask: mask of the player, including the token just placed.
+    :param cell: index i * cols + j of the cell where the token has been placed.
+    """
+    for line in cell_line_masks(rows, cols, win_length)[cell]:
+        if player_mask & line == line:
+            return True
+    return False
+
+
+def check_board(board, tokens, win_length=3):
+    """
+    :param board: nested list board.
+    :param tokens: the pair with the token of each player, any other value is taken as an empty cell.
+    :return: the tuple (game_over, winner) where winner is the token of the player who has won, or None.
+    """
+    game_over, winner = board_status(board_masks(board, *tokens), len(board), len(board[0]), win_length)
+    return game_over, None if winner is None else tokens[winner]
+
+
+def batch_status(player_masks, rows=3, cols=3, win_length=3):
+    """
+    It checks a whole batch of boards at once.
+    :param player_masks: the masks of each player, as returned by position_index.batch_board_masks.
+    :return: the tuple (wins, full) where wins holds, for each player, whether it has won every board, and
+        full whether every board has no empty cell left.
+    """
+    full_board = (1 << (rows * cols)) - 1
+    if is_ndarray(player_masks[0]):
+        # NumPy is optional, it's only imported to vectorize the checks once a batch comes as arrays.
+        import numpy
+        lines = numpy.array(line_masks(rows, cols, win_length), dtype=numpy.int64)
+        wins = [((masks[:, None] & lines) == lines).any(axis=1) for masks in player_masks]
+        occupied = numpy.zeros_like(player_masks[0])
+        for masks in player_masks:
+            occupied |= masks
+        return wins, occupied == full_board
+    if rows * cols <= 16:
+        table = winning_mask_table(rows, cols, win_length)
+        wins = [[table[mask] for mask in masks] for masks in player_masks]
+    else:
+        lines = line_masks(rows, cols, win_length)
+        wins = [[any(mask & line == line for line in lines) for mask in masks] for masks in player_masks]
+    full = []
+    for masks_of_board in zip(*player_masks):
+        occupied = 0
+        for mask in masks_of_board:
+            occupied |= mask
+        full.append(occupied == full_board)
+    return wins, full